@@ -0,0 +1,107 @@
+from datetime import datetime
+
+from hashlib import sha256
+
+from os import makedirs
+from os import rename
+
+from os.path import isdir
+from os.path import isfile
+from os.path import join
+from os.path import splitext
+
+from tempfile import NamedTemporaryFile
+
+import encoder
+import manifest
+import parsers
+import sinks
+import writer
+
+from encoder import encode
+
+from parsers import PATH
+from parsers import Word
+
+
+class PackageCache(object):
+    """Keeps the converted item of every question on disk, so that unchanged questions are not
+    converted again.
+
+    An item is found by a hash of the question, the options it was converted with and the
+    version of the converter, so a changed question, option or converter never finds a stale
+    item. A cached package that is not deterministic keeps the ids and dates it was made with.
+
+    :param str path: The directory the items are kept in, which is created when it is missing.
+    """
+
+    def __init__(self, path):
+        if isinstance(path, str):
+            self.path = path
+        else:
+            raise TypeError('path needs to be a str type')
+
+        if not path:
+            raise ValueError('path cannot be empty')
+
+        if not isdir(path):
+            makedirs(path)
+
+        self.version = converter_version()
+
+    def key(self, interaction, *options):
+        """Returns the key of an interaction converted with the given options."""
+        # every slot, as some (the values of a text entry, for one) are not among the fields
+        question = [[name, normalize(getattr(interaction, name, None))]
+                    for cls in reversed(type(interaction).__mro__)
+                    for name in getattr(cls, '__slots__', ()) if name != PATH.name]
+        source = encode([self.version, type(interaction).__name__, question, normalize(options)],
+                        compact=True)
+        return sha256(source).hexdigest()
+
+    def get(self, key):
+        """Returns the item kept under key, or None if there is none."""
+        file_name = join(self.path, key[:2], key[2:])
+        if not isfile(file_name):
+            return None
+        item_file = open(file_name, 'rb')
+        data = item_file.read()
+        item_file.close()
+        return data
+
+    def put(self, key, data):
+        """Keeps an item under key."""
+        directory = join(self.path, key[:2])
+        if not isdir(directory):
+            try:
+                makedirs(directory)
+            except OSError:
+                if not isdir(directory):
+                    raise
+        # renamed into place so that no other process ever reads half an item
+        item_file = NamedTemporaryFile(dir=directory, delete=False)
+        item_file.write(data)
+        item_file.close()
+        rename(item_file.name, join(directory, key[2:]))
+
+
+def converter_version():
+    """Returns a hash of the source of the modules that write the items and packages."""
+    digest = sha256()
+    for module in (encoder, manifest, parsers, sinks, writer):
+        source_file = open(splitext(module.__file__)[0] + '.py', 'rb')
+        digest.update(source_file.read())
+        source_file.close()
+    return digest.hexdigest()
+
+
+def normalize(value):
+    """Returns a field or option value as JSON, with its words as [content, wid] lists and its
+    datetimes in ISO format, so that it can be hashed."""
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    if isinstance(value, Word):
+        return [value.content, value.wid]
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
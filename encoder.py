@@ -0,0 +1,44 @@
+from json import dumps
+
+try:
+    from simplejson import dumps as simplejson_dumps
+except ImportError:
+    simplejson_dumps = None
+
+
+# the arguments every encoder is called with, so that they all write the same bytes: the keys
+# sorted and the separators given explicitly (simplejson leaves out the space after an item)
+INDENTED = {'indent': 4, 'separators': (', ', ': '), 'sort_keys': True}
+COMPACT = {'separators': (',', ':'), 'sort_keys': True}
+
+ENCODERS = {'json': dumps}
+if simplejson_dumps is not None:
+    ENCODERS['simplejson'] = simplejson_dumps
+
+# the encoder used by encode(), the fastest one installed unless use_encoder() picks another
+ENCODER = 'simplejson' if simplejson_dumps is not None else 'json'
+
+
+def use_encoder(name):
+    """Makes encode() use the named encoder, one of the keys of ENCODERS.
+
+    The standard library encoder is always there. simplejson is used when it is installed,
+    mostly because its C encoder also handles indented output.
+    """
+    global ENCODER
+
+    if not isinstance(name, str):
+        raise TypeError('name needs to be a str type')
+
+    if name not in ENCODERS:
+        raise ValueError('name must be one of ' + ', '.join(sorted(ENCODERS)))
+
+    ENCODER = name
+
+
+def encode(data, compact=False):
+    """Returns data as JSON with its keys sorted, indented unless compact.
+
+    The output is the same whichever encoder is used.
+    """
+    return ENCODERS[ENCODER](data, **(COMPACT if compact else INDENTED))
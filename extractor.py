@@ -7,39 +7,75 @@ from os.path import dirname
 
 from shutil import rmtree
 
+from zipfile import ZIP_DEFLATED
+from zipfile import ZIP_STORED
 from zipfile import ZipFile
 
 from qti_collector import QTICollector
 
+from sinks import ZipSink
+from sinks import check_level
+
 
 class Extractor(object):
-    def __init__(self, path):
+    """Converts an export of QTI packages to a zip of NTI questions.
+
+    With a zlib level, the questions are deflated at that level, in zip_workers threads. When
+    compact, the questions are written without any indentation.
+    """
+
+    def __init__(self, path, level=None, zip_workers=1, compact=False):
         if isinstance(path, str):
             self.path = path
         else:
             raise TypeError('path needs to be a str type')
 
+        if isinstance(compact, bool):
+            self.compact = compact
+        else:
+            raise TypeError('compact needs to be a bool type')
+
+        self.level = None if level is None else check_level(level)
+        self.zip_workers = zip_workers
+
         self.extract()
 
     def extract(self):
         zip_file = ZipFile(self.path, 'r')
         zip_file.extractall(self.path[:-4])
+        if 'imsmanifest.xml' in zip_file.namelist():
+            self.extract_items(zip_file.namelist())
         for zip_ref in zip_file.namelist():
+            if not zip_ref.endswith('.zip'):
+                continue
             extracted = ZipFile(self.path[:-4] + '/' + zip_ref, 'r')
             extracted.extractall(self.path[:-4] + '/' + zip_ref[:-4] + '/')
             remove(self.path[:-4] + '/' + zip_ref[:-4] + '/' + 'imsmanifest.xml')
             qti_file = listdir(self.path[:-4] + '/' + zip_ref[:-4] + '/')[0]
             QTICollector(self.path[:-4] + '/' + zip_ref[:-4] + '/' + qti_file,
-                         self.path[:-4] + '/')
+                         self.path[:-4] + '/', self.compact)
             rmtree(self.path[:-4] + '/' + zip_ref[:-4] + '/')
             remove(self.path[:-4] + '/' + zip_ref)
         zip_file.close()
 
-        zip_json = ZipFile(dirname(zip_file.filename) + '/nti-' +
-                           datetime.now().strftime('%Y-%m-%d_%H-%M-%S') + '.zip', 'w')
+        zip_json = ZipSink(dirname(zip_file.filename) + '/nti-' +
+                           datetime.now().strftime('%Y-%m-%d_%H-%M-%S') + '.zip',
+                           ZIP_STORED if self.level is None else ZIP_DEFLATED, level=self.level,
+                           workers=self.zip_workers)
         for json_file in listdir(self.path[:-4] + '/'):
             if json_file.endswith('.json'):
-                zip_json.write(self.path[:-4] + '/' + json_file, 'nti-' +
-                               datetime.now().strftime('%Y-%m-%d_%H-%M-%S') + '/' + json_file)
+                nti_file = open(self.path[:-4] + '/' + json_file, 'rb')
+                zip_json.writestr('nti-' + datetime.now().strftime('%Y-%m-%d_%H-%M-%S') + '/' +
+                                  json_file, nti_file.read())
+                nti_file.close()
                 remove(self.path[:-4] + '/' + json_file)
+        zip_json.close()
         rmtree(self.path[:-4] + '/')
+
+    def extract_items(self, names):
+        """Converts the items of a single content package, which is extracted already."""
+        remove(self.path[:-4] + '/' + 'imsmanifest.xml')
+        for name in names:
+            if name.endswith('.xml') and name != 'imsmanifest.xml':
+                QTICollector(self.path[:-4] + '/' + name, self.path[:-4] + '/', self.compact)
+                remove(self.path[:-4] + '/' + name)
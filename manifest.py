@@ -1,25 +1,56 @@
 from binascii import b2a_hex
 
+from cStringIO import StringIO
+
 from datetime import datetime
 
+from hashlib import sha256
+
 from io import open as open_file
 
 from os import remove
 from os import urandom
 
 from os.path import basename
+from os.path import exists
 
-from xml.dom.minidom import parseString
+from tempfile import NamedTemporaryFile
 
 from xml.etree.ElementTree import Element
 from xml.etree.ElementTree import SubElement
-from xml.etree.ElementTree import tostring
 
 from zipfile import ZipFile
 
+from sinks import check_level
+from sinks import deflate
+from sinks import write_member
+
+from writer import Template
+from writer import field
+from writer import to_xml
+
+
+# the manifest templates, by compact
+TEMPLATES = {}
+
+# the (head, resource template, tail) of a content package manifest, by compact
+PACKAGE_TEMPLATES = {}
+
+# the earliest date a zip file can hold, for deterministic packages that are not given another
+EPOCH = datetime(1980, 1, 1)
+
 
 class Manifest(object):
-    def __init__(self, identifier, interaction_type, path='', author='author'):
+    """Zips a QTI item with a manifest describing it.
+
+    When a timestamp is given the package is deterministic: the ids in the manifest are hashes
+    of the item and the author instead of random, and the manifest and the zip are dated
+    timestamp instead of now, so the same item always gives the same bytes.
+    The package is stored, or deflated at a zlib level from 0 to 9 when one is given.
+    """
+
+    def __init__(self, identifier, interaction_type, path='', author='author', qti=None,
+                 sink=None, compact=False, timestamp=None, level=None):
         if isinstance(identifier, str):
             self.identifier = identifier
         else:
@@ -40,93 +71,287 @@ class Manifest(object):
         else:
             raise TypeError('author needs to be a str type')
 
+        if qti is None or isinstance(qti, basestring):
+            self.qti = qti
+        else:
+            raise TypeError('qti needs to be a str or unicode type')
+
+        if sink is None or hasattr(sink, 'writestr'):
+            self.sink = sink
+        else:
+            raise TypeError('sink needs to have a writestr method')
+
+        if isinstance(compact, bool):
+            self.compact = compact
+        else:
+            raise TypeError('compact needs to be a bool type')
+
+        if timestamp is None or isinstance(timestamp, datetime):
+            self.timestamp = timestamp
+        else:
+            raise TypeError('timestamp needs to be a datetime type')
+
+        self.level = None if level is None else check_level(level)
+
+        if sink is not None and qti is None:
+            raise ValueError('sink needs qti to be given as well')
+
+        self.package = ''
+        self.data = None
+
         self.manifest()
 
     def manifest(self):
-        manifest = \
-            Element('manifest',
-                    {'xmlns': "http://www.imsglobal.org/xsd/imscp_v1p1",
-                     'xmlns:xsi': "http://www.w3.org/2001/XMLSchema-instance",
-                     'xsi:schemaLocation':
-                         "http://www.imsglobal.org/xsd/imscp_v1p1"
-                         "http://www.imsglobal.org/xsd/qti/qtiv2p2/qtiv2p2_imscpv1p2_v1p0.xsd"
-                         "http://www.imsglobal.org/xsd/imsqti_v2p2"
-                         "http://www.imsglobal.org/xsd/qti/qtiv2p2/imsqti_v2p2.xsd"
-                         "http://www.imsglobal.org/xsd/imsqti_metadata_v2p2"
-                         "http://www.imsglobal.org/xsd/qti/qtiv2p2/imsqti_metadata_v2p2.xsd"
-                         "http://ltsc.ieee.org/xsd/LOM"
-                         "http://www.imsglobal.org/xsd/imsmd_loose_v1p3p2.xsd",
-                     'identifier': 'manifestID'})
-        metadata = SubElement(manifest, 'metadata')
-        schema = SubElement(metadata, 'schema')
-        schema.text = 'QTIv2.2 Package'
-        schema_version = SubElement(metadata, 'schemaversion')
-        schema_version.text = '1.0.0'
-        # organizations
-        SubElement(manifest, 'organizations')
-        resources = SubElement(manifest, 'resources')
-        resource = SubElement(resources, 'resource', {'identifier': self.identifier,
-                                                      'type': 'imsqti_item_xmlv2p2',
-                                                      'href': self.identifier + '.xml'})
-        metadata_resource = SubElement(resource, 'metadata')
-        lom = SubElement(metadata_resource, 'lom', {'xmls': "http://ltsc.ieee.org/xsd/LOM"})
-        general = SubElement(lom, 'general')
-        identifier = SubElement(general, 'identifier')
-        entry = SubElement(identifier, 'entry')
-        entry.text = 'id' + b2a_hex(urandom(16))
-        title = SubElement(general, 'title')
-        string = SubElement(title, 'string', {'language': "en"})
-        string.text = self.identifier
-        life_cycle = SubElement(lom, 'lifeCycle')
-        contribute = SubElement(life_cycle, 'contribute')
-        date = SubElement(contribute, 'date')
-        date_time = SubElement(date, 'dateTime')
-        date_time.text = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
-        role = SubElement(contribute, 'role')
-        source = SubElement(role, 'source')
-        source.text = 'LOMv1.0'
-        value = SubElement(role, 'value')
-        value.text = self.author
-        entity = SubElement(life_cycle, 'entity')
-        entity.text = b2a_hex(urandom(16))
-        educational = SubElement(lom, 'educational')
-        learning_resource_type = SubElement(educational, 'learningResourceType')
-        source = SubElement(learning_resource_type, 'source')
-        source.text = 'QTIv2.2'
-        value = SubElement(learning_resource_type, 'value')
-        value.text = 'AssessmentItem'
-        qti_meta_data = SubElement(lom, 'qtiMetaData',
-                                   {'xmlns': "http://www.imsglobal.org/xsd/imsqti_metadata_v2p2"})
-        interaction_type = SubElement(qti_meta_data, 'interactionType')
-        interaction_type.text = self.interaction_type
-        # file
-        SubElement(resource, 'file', {'href': self.identifier + '.xml'})
-
-        rough_string = tostring(manifest)
-        reparsed = parseString(rough_string)
-
-        if not self.path:
-            qti_file = open_file('imsmanifest.xml', 'w+', encoding="utf-8")
-        else:
-            qti_file = open_file(self.path + 'imsmanifest.xml', 'w+', encoding="utf-8")
-        qti_file.write(reparsed.toprettyxml(indent="  "))
+        qti = self.qti
+        if qti is None and self.timestamp is not None:
+            # the item is read back to derive its id from it
+            qti_file = open_file(self.path + self.identifier + '.xml', 'rb')
+            qti = qti_file.read()
+            qti_file.close()
+
+        entry, date, entity = stamp(qti, self.author, self.timestamp)
+        manifest = template(self.compact).render(identifier=self.identifier, entry=entry,
+                                                 date=date, author=self.author, entity=entity,
+                                                 interaction_type=self.interaction_type)
+
+        if self.qti is not None:
+            self.export_memory(manifest)
+            return
+
+        # named after the item so that items converted concurrently do not share the file
+        qti_file = open_file(self.path + self.identifier + '.imsmanifest.xml', 'wb')
+        qti_file.write(manifest)
         qti_file.close()
 
         self.export()
 
     def export(self):
-        if not self.path:
-            zip_file = ZipFile(self.identifier + '.zip', 'w')
-            zip_file.write('imsmanifest.xml')
-            remove('imsmanifest.xml')
-            zip_file.write(self.identifier + '.xml')
-            remove(self.identifier + '.xml')
-            zip_file.close()
+        self.package = self.path + self.identifier + '.zip'
+        zip_file = ZipFile(self.package, 'w', allowZip64=True)
+        for file_name, name in ((self.path + self.identifier + '.imsmanifest.xml',
+                                 'imsmanifest.xml'),
+                                (self.path + self.identifier + '.xml',
+                                 basename(self.path + self.identifier + '.xml'))):
+            if self.timestamp is None and self.level is None:
+                zip_file.write(file_name, name)
+            else:
+                member = open_file(file_name, 'rb')
+                self.write(zip_file, name, member.read())
+                member.close()
+            remove(file_name)
+        zip_file.close()
+
+    def export_memory(self, manifest):
+        """Zips the manifest and the QTI item in memory, without any temporary files.
+
+        The zip is kept in data and, if there is a sink, also written to it.
+        """
+        buf = StringIO()
+        zip_file = ZipFile(buf, 'w', allowZip64=True)
+        self.write(zip_file, 'imsmanifest.xml', manifest)
+        self.write(zip_file, self.identifier + '.xml',
+                   self.qti.encode('utf-8') if isinstance(self.qti, unicode) else self.qti)
+        zip_file.close()
+
+        self.package = self.identifier + '.zip'
+        self.data = buf.getvalue()
+        if self.sink is not None:
+            self.sink.writestr(self.package, self.data)
+
+    def write(self, zip_file, name, data):
+        write_member(zip_file, name, data, self.timestamp,
+                     None if self.level is None else deflate(data, self.level))
+
+
+class ContentPackage(object):
+    """Collects QTI items into a single IMS content package, with one manifest listing them all.
+
+    Every item is written to the sink as soon as it is added, and its resource is appended to a
+    temporary file holding the manifest, so that memory does not grow with the number of items.
+    close() copies the manifest to the sink and removes the file. The sink itself is not closed.
+
+    :param sink: Anything with writestr and write methods, such as a ZipFile or one of the sinks.
+    :param str author: The author named in the metadata of every resource.
+    :param bool compact: Whether to write the manifest without any indentation.
+    :param timestamp: A datetime making the manifest deterministic, as for Manifest.
+    """
+
+    def __init__(self, sink, author='author', compact=False, timestamp=None):
+        if hasattr(sink, 'writestr') and hasattr(sink, 'write'):
+            self.sink = sink
+        else:
+            raise TypeError('sink needs to have writestr and write methods')
+
+        if isinstance(author, str):
+            self.author = author
         else:
-            zip_file = ZipFile(self.path + self.identifier + '.zip', 'w')
-            zip_file.write(self.path + 'imsmanifest.xml', basename(self.path + 'imsmanifest.xml'))
-            remove(self.path + 'imsmanifest.xml')
-            zip_file.write(self.path + self.identifier + '.xml',
-                           basename(self.path + self.identifier + '.xml'))
-            remove(self.path + self.identifier + '.xml')
-            zip_file.close()
+            raise TypeError('author needs to be a str type')
+
+        if isinstance(compact, bool):
+            self.compact = compact
+        else:
+            raise TypeError('compact needs to be a bool type')
+
+        if timestamp is None or isinstance(timestamp, datetime):
+            self.timestamp = timestamp
+        else:
+            raise TypeError('timestamp needs to be a datetime type')
+
+        # the head and tail of the manifest, and the template of the resources between them
+        self.head, self.resource, self.tail = package_templates(compact)
+        self.count = 0
+        self.manifest_file = NamedTemporaryFile(suffix='.xml', delete=False)
+        self.manifest_file.write(self.head)
+
+    def add(self, identifier, interaction_type, qti):
+        """Writes a QTI item to the sink and lists it in the manifest."""
+        if not isinstance(identifier, str):
+            raise TypeError('identifier needs to be a str type')
+
+        if not isinstance(interaction_type, str):
+            raise TypeError('interaction_type needs to be a str type')
+
+        if not isinstance(qti, basestring):
+            raise TypeError('qti needs to be a str or unicode type')
+
+        if isinstance(qti, unicode):
+            qti = qti.encode('utf-8')
+        self.sink.writestr(identifier + '.xml', qti)
+        entry, date, entity = stamp(qti, self.author, self.timestamp)
+        self.manifest_file.write(self.resource.render(identifier=identifier, entry=entry,
+                                                      date=date, author=self.author,
+                                                      entity=entity,
+                                                      interaction_type=interaction_type))
+        self.count += 1
+
+    def close(self):
+        """Writes the manifest listing every item added to the sink."""
+        try:
+            if not self.count:
+                raise ValueError('resources[] cannot be empty')
+
+            self.manifest_file.write(self.tail)
+            self.manifest_file.close()
+            self.sink.write(self.manifest_file.name, 'imsmanifest.xml')
+        finally:
+            self.discard()
+
+    def discard(self):
+        """Removes the manifest without writing it, unless close() has done so already."""
+        if not self.manifest_file.closed:
+            self.manifest_file.close()
+        if exists(self.manifest_file.name):
+            remove(self.manifest_file.name)
+
+
+def stamp(qti, author, timestamp=None):
+    """Returns the entry, date and entity of the resource of a QTI item.
+
+    They are random and now, or, with a timestamp, hashes of the item and of the author and the
+    timestamp.
+    """
+    if timestamp is None:
+        return ('id' + b2a_hex(urandom(16)), datetime.now().strftime('%Y-%m-%dT%H:%M:%S'),
+                b2a_hex(urandom(16)))
+
+    if isinstance(qti, unicode):
+        qti = qti.encode('utf-8')
+    # as long as the random ids
+    return ('id' + sha256(qti).hexdigest()[:32], timestamp.strftime('%Y-%m-%dT%H:%M:%S'),
+            sha256(author).hexdigest()[:32])
+
+
+def skeleton(resources):
+    """Returns a manifest listing the given resource elements."""
+    manifest = \
+        Element('manifest',
+                {'xmlns': "http://www.imsglobal.org/xsd/imscp_v1p1",
+                 'xmlns:xsi': "http://www.w3.org/2001/XMLSchema-instance",
+                 'xsi:schemaLocation':
+                     "http://www.imsglobal.org/xsd/imscp_v1p1"
+                     "http://www.imsglobal.org/xsd/qti/qtiv2p2/qtiv2p2_imscpv1p2_v1p0.xsd"
+                     "http://www.imsglobal.org/xsd/imsqti_v2p2"
+                     "http://www.imsglobal.org/xsd/qti/qtiv2p2/imsqti_v2p2.xsd"
+                     "http://www.imsglobal.org/xsd/imsqti_metadata_v2p2"
+                     "http://www.imsglobal.org/xsd/qti/qtiv2p2/imsqti_metadata_v2p2.xsd"
+                     "http://ltsc.ieee.org/xsd/LOM"
+                     "http://www.imsglobal.org/xsd/imsmd_loose_v1p3p2.xsd",
+                 'identifier': 'manifestID'})
+    metadata = SubElement(manifest, 'metadata')
+    schema = SubElement(metadata, 'schema')
+    schema.text = 'QTIv2.2 Package'
+    schema_version = SubElement(metadata, 'schemaversion')
+    schema_version.text = '1.0.0'
+    # organizations
+    SubElement(manifest, 'organizations')
+    SubElement(manifest, 'resources').extend(resources)
+
+    return manifest
+
+
+def resource(identifier, interaction_type, author, entry, date, entity):
+    """Returns the resource element of a QTI item, with its LOM metadata."""
+    resource = Element('resource', {'identifier': identifier,
+                                    'type': 'imsqti_item_xmlv2p2',
+                                    'href': identifier + '.xml'})
+    metadata_resource = SubElement(resource, 'metadata')
+    lom = SubElement(metadata_resource, 'lom', {'xmls': "http://ltsc.ieee.org/xsd/LOM"})
+    general = SubElement(lom, 'general')
+    identifier_element = SubElement(general, 'identifier')
+    entry_element = SubElement(identifier_element, 'entry')
+    entry_element.text = entry
+    title = SubElement(general, 'title')
+    string = SubElement(title, 'string', {'language': "en"})
+    string.text = identifier
+    life_cycle = SubElement(lom, 'lifeCycle')
+    contribute = SubElement(life_cycle, 'contribute')
+    date_element = SubElement(contribute, 'date')
+    date_time = SubElement(date_element, 'dateTime')
+    date_time.text = date
+    role = SubElement(contribute, 'role')
+    source = SubElement(role, 'source')
+    source.text = 'LOMv1.0'
+    value = SubElement(role, 'value')
+    value.text = author
+    entity_element = SubElement(life_cycle, 'entity')
+    entity_element.text = entity
+    educational = SubElement(lom, 'educational')
+    learning_resource_type = SubElement(educational, 'learningResourceType')
+    source = SubElement(learning_resource_type, 'source')
+    source.text = 'QTIv2.2'
+    value = SubElement(learning_resource_type, 'value')
+    value.text = 'AssessmentItem'
+    qti_meta_data = SubElement(lom, 'qtiMetaData',
+                               {'xmlns': "http://www.imsglobal.org/xsd/imsqti_metadata_v2p2"})
+    interaction_type_element = SubElement(qti_meta_data, 'interactionType')
+    interaction_type_element.text = interaction_type
+    # file
+    SubElement(resource, 'file', {'href': identifier + '.xml'})
+
+    return resource
+
+
+def fields():
+    """Returns a resource element with fields for everything that differs per item."""
+    return resource(field('identifier'), field('interaction_type'), field('author'),
+                    field('entry'), field('date'), field('entity'))
+
+
+def template(compact=False):
+    """Returns the manifest template for a layout, building it the first time it is needed."""
+    if compact not in TEMPLATES:
+        TEMPLATES[compact] = Template(skeleton([fields()]), compact=compact)
+    return TEMPLATES[compact]
+
+
+def package_templates(compact=False):
+    """Returns the head and tail of a manifest for a layout, and the template of its resources.
+
+    The resources are listed in between the head and the tail.
+    """
+    if compact not in PACKAGE_TEMPLATES:
+        # an empty resource marks where the resources go
+        placeholder = ('' if compact else '    ') + '<resource/>' + ('' if compact else '\n')
+        head, tail = to_xml(skeleton([Element('resource')]), compact=compact).split(placeholder)
+        PACKAGE_TEMPLATES[compact] = head, Template(fields(), compact=compact, depth=2), tail
+    return PACKAGE_TEMPLATES[compact]
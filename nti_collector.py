@@ -1,10 +1,17 @@
+from cStringIO import StringIO
+
 from datetime import datetime
 
-from os import listdir
+from mmap import ACCESS_READ
+from mmap import mmap
+
+from multiprocessing import Pool
+
+from os import fstat
 from os import makedirs
 from os import remove
 
-from os.path import dirname
+from os.path import basename
 from os.path import isdir
 
 from re import compile as compile_pattern
@@ -13,7 +20,12 @@ from shutil import rmtree
 
 from sys import modules
 
-from zipfile import ZipFile
+from zipfile import ZIP_DEFLATED
+from zipfile import ZIP_STORED
+
+from cache import PackageCache
+
+from manifest import ContentPackage
 
 from parsers import ChoiceInteraction
 from parsers import ExtendedTextInteraction
@@ -21,13 +33,34 @@ from parsers import InlineChoiceInteraction
 from parsers import MatchInteraction
 from parsers import TextEntryInteraction
 from parsers import UploadInteraction
+from parsers import Word
+
+from reader import EventReader
+from reader import QuestionSpans
+
+from sinks import ZipSink
+from sinks import check_level
+
+
+PARTS = {'ChoiceInteraction': ('MultipleChoicePart', 'MultipleChoiceMultipleAnswerPart'),
+         'ExtendedTextInteraction': ('ModeledContentPart',),
+         'InlineChoiceInteraction': ('FillInTheBlankWithWordBankPart',),
+         'MatchInteraction': ('MatchingPart', 'OrderingPart'),
+         'TextEntryInteraction': ('FreeResponsePart', 'SymbolicMathPart'),
+         'UploadInteraction': ('FilePart',)}
+
+# classes that only occur inside of a Question
+COMPONENTS = ('Part', 'Solution', 'Hint', 'WordBank', 'WordEntry')
 
 
 class NTICollector(object):
 
-    def __init__(self, file_name, path='', class_type=''):
+    def __init__(self, file_name, path='', class_type='', lazy=False, workers=1,
+                 memory_map=False, in_memory=False, compact=False, sink=None,
+                 single_package=False, timestamp=None, cache=None, level=None, zip_workers=1):
         if isinstance(path, str):
-            if path:
+            # nothing is written below path when the packages are built in memory
+            if path and not (in_memory or single_package or cache):
                 try:
                     makedirs(path)
                 except OSError:
@@ -46,22 +79,24 @@ class NTICollector(object):
         else:
             raise TypeError('file_name needs to be a str type')
 
-        if not isinstance(class_type, str):
-            raise TypeError('class_type needs to be a str type')
+        if not isinstance(class_type, (str, set, frozenset)):
+            raise TypeError('class_type needs to be a str or set type')
+
+        if not isinstance(lazy, bool):
+            raise TypeError('lazy needs to be a bool type')
+
+        if isinstance(memory_map, bool):
+            self.memory_map = memory_map
+        else:
+            raise TypeError('memory_map needs to be a bool type')
 
         if not file_name.lower().endswith('.json'):
             raise TypeError('file_name must be a .json file')
 
-        self.line_counter = 0
-        self.total_lines = sum(1 for line in open(self.file_name) if line.rstrip())
-
         self.class_type = ''
-        self.content = ''
         self.identifier = ''
         self.prompt = ''
         self.title = ''
-        self.wid = ''
-        self.word = ''
         self.value_single = ''
 
         self.choices = []
@@ -76,330 +111,315 @@ class NTICollector(object):
                       'MultipleChoicePart', 'MultipleChoiceMultipleAnswerPart', 'OrderingPart',
                       'SymbolicMathPart')
 
-        self.collect()
-        self.convert(class_type)
-
-    def collect(self):
-        infile = open(self.file_name, 'r')
-        for line in infile:
-            self.line_counter += 1
-
-            if '"Class": "Poll",' in line:
-                while '"Class": "Question"' not in line:
-                    self.line_counter += 1
-                    line = next(infile)
-
-            if ('"NTIID":' or '"ntiid":') in line:
-                matcher = \
-                    compile_pattern(r'"(NTIID|ntiid)": '
-                                    r'"(tag:.+_(.+)\.naq\.qid(\.content)?(\..+))",?').search(line)
-                if matcher is not None:
-                    self.identifier = str(matcher.group(2))
-                    self.title = str(matcher.group(3)) + str(matcher.group(5))
-
-            if '"content":' in line:
-                matcher = compile_pattern('"content": "(.*)",?').search(line)
-                if matcher is not None:
-                    self.prompt = matcher.group(1)
-
-            if '"Class": "FilePart"' in line:
-                self.questions.append(UploadInteraction(self.identifier, self.prompt, self.title,
-                                                        self.path))
-
-            if '"Class": "FillInTheBlankWithWordBankPart",' in line:
-                while ('"Class": "Question"' not in line and '"Class": "Poll"' not in line) and \
-                        not self.line_counter == self.total_lines:
-                    self.line_counter += 1
-                    line = next(infile)
-
-                    if '"content": "",' in line:
-                        self.line_counter += 1
-                        line = next(infile)
-                    elif '"content":' in line:
-                        matcher = compile_pattern('"content": "(.*)",?').search(line)
-                        if matcher is not None:
-                            self.prompt += ' ' + matcher.group(1)
-
-                    if '"input": "",' in line:
-                        self.line_counter += 1
-                        line = next(infile)
-                    elif '"input":' in line:
-                        matcher = compile_pattern('"input": "(.+)",?').search(line)
-                        if matcher is not None:
-                            self.prompt += ' ' + matcher.group(1)
-
-                    if '"value": {' in line:
-                        while '}' not in line:
-                            self.line_counter += 1
-                            line = next(infile)
-
-                            matcher = compile_pattern('"(\\d{3})": \\[').search(line)
-                            if matcher is not None:
-                                self.labels.append(str(matcher.group(1)))
-
-                            matcher = compile_pattern('"(\\d{1,3})"(?!:)').search(line)
-                            if matcher is not None:
-                                self.solutions.append(str(matcher.group(1)))
-
-                    if '"entries": [' in line:
-                        while ']' not in line:
-                            self.line_counter += 1
-                            line = next(infile)
-                            matcher = compile_pattern('"content": "(.*)",?').search(line)
-                            if matcher is not None:
-                                self.content = str(matcher.group(1))
-                            matcher = compile_pattern('"wid": "(.*)",?').search(line)
-                            if matcher is not None:
-                                self.wid = str(matcher.group(1))
-                            matcher = compile_pattern('"word": "(.*)",?').search(line)
-                            if matcher is not None:
-                                self.word = str(matcher.group(1))
-
-                            if self.content and self.wid:
-                                self.words.append(self.Word(self.content, self.wid))
-                                self.content = ''
-                                self.wid = ''
-                            elif self.word and self.wid:
-                                self.words.append(self.Word(self.word, self.wid))
-                                self.content = ''
-                                self.wid = ''
-
-                self.questions.append(InlineChoiceInteraction(self.identifier, self.prompt,
-                                                              self.title, self.labels,
-                                                              self.solutions, self.words, True,
-                                                              self.path))
+        self.part_types = self.select(class_type)
+
+        # the parts are filtered while scanning, so convert() does not have to filter again
+        if not lazy:
+            self.collect(workers)
+        self.convert(lazy=lazy, workers=workers, in_memory=in_memory, compact=compact, sink=sink,
+                     single_package=single_package, timestamp=timestamp, cache=cache, level=level,
+                     zip_workers=zip_workers)
+
+    def select(self, class_type):
+        """Returns the part classes for an interaction or part class name, or a set of them.
+
+        None is returned for an empty class_type, meaning that every part is converted.
+        """
+        if isinstance(class_type, str):
+            class_type = set([class_type]) if class_type else set()
+
+        part_types = set()
+        for name in class_type:
+            if name in PARTS:
+                part_types.update(PARTS[name])
+            elif name in self.types:
+                part_types.add(name)
+            else:
+                raise ValueError(str(name) + ' is not an interaction or part class')
+        return part_types or None
+
+    def collect(self, workers=1):
+        if not isinstance(workers, int):
+            raise TypeError('workers needs to be an int type')
+
+        if workers < 1:
+            raise ValueError('workers must be greater than 0')
+
+        if workers == 1:
+            for interaction in self.iter_questions():
+                self.questions.append(interaction)
+            return
+
+        infile = open(self.file_name, 'rb')
+        source = self.source(infile)
+        try:
+            spans = list(QuestionSpans(source))
+        finally:
+            source.close()
+            infile.close()
+
+        pool = Pool(workers)
+        try:
+            # map returns the shards in file order, so the questions keep their order
+            for interactions in pool.map(parse, [(self, shard)
+                                                 for shard in self.shard(spans, workers)]):
+                self.questions.extend(interactions)
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+    @staticmethod
+    def shard(spans, count):
+        """Splits the question spans into at most count runs of about the same number of bytes."""
+        if not spans:
+            return []
+        size = float(spans[-1][1] - spans[0][0]) / count
+        shards = [[]]
+        for start, end in spans:
+            if shards[-1] and start - spans[0][0] >= size * len(shards):
+                shards.append([])
+            shards[-1].append((start, end))
+        return shards
+
+    def parse(self, spans):
+        """Returns the interactions of the questions found at the given byte spans of the file."""
+        interactions = []
+        infile = open(self.file_name, 'rb')
+        source = self.source(infile)
+        try:
+            for start, end in spans:
+                # a mapped file is shared through the page cache by all of the workers
+                source.seek(start)
+                for question in self.scan(EventReader(StringIO(source.read(end - start)))):
+                    interactions.extend(self.assemble(question))
+        finally:
+            source.close()
+            infile.close()
+        return interactions
+
+    def source(self, infile):
+        """Returns infile memory-mapped if memory_map is set and the file is not empty."""
+        if self.memory_map and fstat(infile.fileno()).st_size:
+            return mmap(infile.fileno(), 0, access=ACCESS_READ)
+        return infile
+
+    def iter_questions(self):
+        """Yields the interactions of every question as soon as its Question object is closed."""
+        # the reader stops at the end of the stream, so the input is only ever read once
+        infile = open(self.file_name, 'rb')
+        source = self.source(infile)
+        try:
+            for question in self.scan(EventReader(source)):
+                for interaction in self.assemble(question):
+                    yield interaction
+        finally:
+            source.close()
+            infile.close()
+
+    def scan(self, reader):
+        """Builds every Question object of the export from the reader's events and yields it.
+
+        Containers that turn out not to be (or to be inside) a Question are no longer built once
+        their Class is known, and Poll subtrees are skipped, so only one question is held in memory.
+        Parts whose class is not supported, or not in part_types, are skipped the same way.
+        """
+        # one [container, key, is_question] frame per open map or array
+        stack = []
+        open_questions = 0
+        for event, value in reader:
+            if event == 'start_map':
+                stack.append([{}, None, False])
+            elif event == 'start_array':
+                stack.append([[], None, False])
+            elif event == 'map_key':
+                stack[-1][1] = value
+            elif event == 'end_map' or event == 'end_array':
+                container, _, is_question = stack.pop()
+                if is_question:
+                    open_questions -= 1
+                    yield container
+                elif stack:
+                    self.add(stack[-1], container)
+            elif stack:
+                frame = stack[-1]
+                if frame[1] == 'Class' and isinstance(frame[0], dict):
+                    if value == 'Question':
+                        frame[2] = True
+                        open_questions += 1
+                    elif value == 'Poll' or (open_questions and isinstance(value, basestring) and
+                                             value.endswith('Part') and
+                                             value not in (self.part_types or self.types)):
+                        # the rest of the subtree is skipped by counting its brackets
+                        reader.skip()
+                        stack.pop()
+                        if value != 'Poll' and stack:
+                            # keeps the class so that assemble() can report it as unsupported,
+                            # and so that the other parts keep their place
+                            self.add(stack[-1], {'Class': value})
+                        continue
+                    elif not open_questions and not (isinstance(value, basestring) and
+                                                     value.endswith(COMPONENTS)):
+                        # parts read before their question's Class (unsorted keys) are kept
+                        frame[0] = None
+                self.add(frame, value)
+
+    @staticmethod
+    def add(frame, value):
+        if frame[0] is None:
+            return
+        if isinstance(frame[0], dict):
+            frame[0][frame[1]] = value
+        else:
+            frame[0].append(value)
+
+    def assemble(self, question):
+        ntiid = question.get('NTIID') or question.get('ntiid')
+        if ntiid:
+            matcher = compile_pattern(r'(tag:.+_(.+)\.naq\.qid(\.content)?(\..+))')\
+                .match(self.text(ntiid))
+            if matcher is not None:
+                self.identifier = str(matcher.group(1))
+                self.title = str(matcher.group(2)) + str(matcher.group(4))
+
+        title = self.title
+        for index, part in enumerate(question.get('parts') or []):
+            if not isinstance(part, dict):
+                continue
+            class_type = part.get('Class', '')
+            if self.part_types is not None and class_type not in self.part_types:
+                continue
+
+            # the parts share the title of their question, and a package is named after it
+            self.title = title + '.part' + str(index) if index else title
+
+            self.prompt = self.text(question.get('content') or '')
+            if part.get('content'):
+                self.prompt += ' ' + self.text(part['content'])
+
+            if class_type == 'FilePart':
+                yield UploadInteraction(self.identifier, self.prompt, self.title, self.path)
+
+            elif class_type == 'FillInTheBlankWithWordBankPart':
+                if part.get('input'):
+                    self.prompt += ' ' + self.text(part['input'])
+
+                for solution in part.get('solutions') or []:
+                    value = solution.get('value') or {}
+                    for label in sorted(value):
+                        self.labels.append(self.text(label))
+                        wids = value[label] if isinstance(value[label], list) else [value[label]]
+                        for wid in wids:
+                            self.solutions.append(self.text(wid))
+
+                wordbank = part.get('wordbank') or question.get('wordbank') or {}
+                for entry in wordbank.get('entries') or []:
+                    content = entry.get('content') or entry.get('word')
+                    if content and entry.get('wid'):
+                        self.words.append(self.Word(self.text(content), self.text(entry['wid'])))
+
+                yield InlineChoiceInteraction(self.identifier, self.prompt, self.title,
+                                              self.labels, self.solutions, self.words, True,
+                                              self.path)
 
                 self.labels = []
                 self.solutions = []
                 self.words = []
 
-                if '"Class": "Poll",' in line:
-                    while '"Class": "Question"' not in line:
-                        self.line_counter += 1
-                        line = next(infile)
-
-            if '"Class": "FreeResponsePart",' in line:
-                while ('"Class": "Question"' not in line and '"Class": "Poll"' not in line) and \
-                        not self.line_counter == self.total_lines:
-                    self.line_counter += 1
-                    line = next(infile)
-
-                    if '"value": ' in line:
-                        matcher = compile_pattern('"value": "(.+)",?').search(line)
-                        if matcher is not None:
-                            self.values.append(str(matcher.group(1)))
-
-                    if '"content": "",' in line:
-                        self.line_counter += 1
-                        line = next(infile)
-                    elif '"content":' in line:
-                        matcher = compile_pattern('"content": "(.*)",?').search(line)
-                        if matcher is not None:
-                            self.prompt += ' ' + matcher.group(1)
-
-                self.questions.append(
-                    TextEntryInteraction(self.identifier, self.prompt, self.title, self.values,
-                                         False, self.path))
+            elif class_type == 'FreeResponsePart':
+                for solution in part.get('solutions') or []:
+                    if solution.get('value'):
+                        self.values.append(self.text(solution['value']))
+
+                yield TextEntryInteraction(self.identifier, self.prompt, self.title, self.values,
+                                           False, self.path)
 
-                self.choices = []
                 self.values = []
 
-                if '"Class": "Poll",' in line:
-                    while '"Class": "Question"' not in line:
-                        self.line_counter += 1
-                        line = next(infile)
-
-            if '"Class": "MatchingPart"' in line or '"Class": "OrderingPart"' in line:
-                matcher = compile_pattern('"Class": "(.+Part)",?').search(line)
-                if matcher is not None:
-                    self.class_type = matcher.group(1)
-                while ('"Class": "Question"' not in line and '"Class": "Poll"' not in line) and \
-                        not self.line_counter == self.total_lines:
-                    self.line_counter += 1
-                    line = next(infile)
-
-                    if '"content": "",' in line:
-                        self.line_counter += 1
-                        line = next(infile)
-                    elif '"content":' in line:
-                        matcher = compile_pattern('"content": "(.*)",?').search(line)
-                        if matcher is not None:
-                            self.prompt += ' ' + matcher.group(1)
-
-                    if '"labels": [' in line:
-                        while ']' not in line:
-                            self.line_counter += 1
-                            line = next(infile)
-
-                            matcher = compile_pattern('"(.+)",?').search(line)
-                            if matcher is not None:
-                                self.labels.append(str(matcher.group(1)))
-
-                    if '"value": {' in line:
-                        while '}' not in line:
-                            self.line_counter += 1
-                            line = next(infile)
-
-                            matcher = compile_pattern('"(\\d+)":( \\d+),?').search(line)
-                            if matcher is not None:
-                                self.solutions.append(str(matcher.group(1) + matcher.group(2)))
-
-                    if '"values": [' in line:
-                        while ']' not in line:
-                            self.line_counter += 1
-                            line = next(infile)
-
-                            matcher = compile_pattern('"(.+)",?').search(line)
-                            if matcher is not None:
-                                self.values.append(str(matcher.group(1)))
-
-                if self.class_type == 'MatchingPart':
-                    self.questions.append(
-                        MatchInteraction(self.identifier, self.prompt, self.title, self.labels,
-                                         self.solutions, self.values, self.path))
-
-                elif self.class_type == 'OrderingPart':
-                    self.questions.append(
-                        MatchInteraction(self.identifier, self.prompt, self.title, self.labels,
-                                         self.solutions, self.values, self.path))
+            elif class_type == 'MatchingPart' or class_type == 'OrderingPart':
+                for label in part.get('labels') or []:
+                    self.labels.append(self.text(label))
+
+                for solution in part.get('solutions') or []:
+                    value = solution.get('value') or {}
+                    for key in sorted(value, key=int):
+                        self.solutions.append(self.text(key) + ' ' + self.text(value[key]))
+
+                for value in part.get('values') or []:
+                    self.values.append(self.text(value))
+
+                yield MatchInteraction(self.identifier, self.prompt, self.title, self.labels,
+                                       self.solutions, self.values, self.path)
 
                 self.labels = []
                 self.values = []
                 self.solutions = []
 
-                if '"Class": "Poll",' in line:
-                    while '"Class": "Question"' not in line:
-                        self.line_counter += 1
-                        line = next(infile)
-
-            if '"Class": "ModeledContentPart"' in line:
-                self.questions.append(ExtendedTextInteraction(self.identifier, self.prompt,
-                                                              self.title, self.path))
-
-            if '"Class": "MultipleChoicePart",' in line:
-                while ('"Class": "Question"' not in line and '"Class": "Poll"' not in line) and \
-                        not self.line_counter == self.total_lines:
-                    self.line_counter += 1
-                    line = next(infile)
-
-                    if '"choices": [' in line:
-                        while '],' not in line:
-                            self.line_counter += 1
-                            line = next(infile)
-
-                            matcher = \
-                                compile_pattern('"(<a name=.+>.*</a>.*<p class=.+id=.+>(.+)</p>)"')\
-                                .search(line)
-                            if matcher is not None:
-                                self.choices.append(matcher.group(1))
-
-                    if '"content": "",' in line:
-                        self.line_counter += 1
-                        line = next(infile)
-                    elif '"content":' in line:
-                        matcher = compile_pattern('"content": "(.*)",?').search(line)
-                        if matcher is not None:
-                            self.prompt += ' ' + matcher.group(1)
-
-                    if '"value":' in line:
-                        matcher = compile_pattern('"value": (\\d),?').search(line)
-                        if matcher is not None:
-                            self.values.append(matcher.group(1))
-
-                self.questions.append(ChoiceInteraction(self.identifier, self.prompt, self.title,
-                                                        self.values, self.choices, self.path))
-
-                self.choices = []
-                self.values = []
+            elif class_type == 'ModeledContentPart':
+                yield ExtendedTextInteraction(self.identifier, self.prompt, self.title, self.path)
 
-                if '"Class": "Poll",' in line:
-                    while '"Class": "Question"' not in line:
-                        self.line_counter += 1
-                        line = next(infile)
-
-            if '"Class": "MultipleChoiceMultipleAnswerPart",' in line:
-                while ('"Class": "Question"' not in line and '"Class": "Poll"' not in line) and \
-                        not self.line_counter == self.total_lines:
-                    self.line_counter += 1
-                    line = next(infile)
-
-                    if '"choices": [' in line:
-                        while '],' not in line:
-                            self.line_counter += 1
-                            line = next(infile)
-
-                            matcher = \
-                                compile_pattern('"(<a name=.+>.*</a>.*<p class=.+id=.+>(.+)</p>)"')\
-                                .search(line)
-                            if matcher is not None:
-                                self.choices.append(matcher.group(1))
-
-                    if '"content": "",' in line:
-                        self.line_counter += 1
-                        line = next(infile)
-                    elif '"content":' in line:
-                        matcher = compile_pattern('"content": "(.*)",?').search(line)
-                        if matcher is not None:
-                            self.prompt += ' ' + matcher.group(1)
-
-                    if '"value": [' in line:
-                        while '],' not in line:
-                            self.line_counter += 1
-                            line = next(infile)
-
-                            matcher = compile_pattern('(\\d),?').search(line)
-                            if matcher is not None:
-                                self.values.append(matcher.group(1))
-
-                self.questions.append(ChoiceInteraction(self.identifier, self.prompt, self.title,
-                                                        self.values, self.choices, self.path))
+            elif class_type == 'MultipleChoicePart' or \
+                    class_type == 'MultipleChoiceMultipleAnswerPart':
+                for choice in part.get('choices') or []:
+                    matcher = compile_pattern('(<a name=.+>.*</a>.*<p class=.+id=.+>(.+)</p>)')\
+                        .search(self.text(choice))
+                    if matcher is not None:
+                        self.choices.append(matcher.group(1))
 
-                self.choices = []
-                self.values = []
+                for solution in part.get('solutions') or []:
+                    value = solution.get('value')
+                    for index in value if isinstance(value, list) else [value]:
+                        if index is not None:
+                            self.values.append(self.text(index))
 
-                if '"Class": "Poll",' in line:
-                    while '"Class": "Question"' not in line:
-                        self.line_counter += 1
-                        line = next(infile)
-
-            if '"Class": "SymbolicMathPart",' in line:
-                while ('"Class": "Question"' not in line and '"Class": "Poll"' not in line) and \
-                        not self.line_counter == self.total_lines:
-                    self.line_counter += 1
-                    line = next(infile)
-
-                    if '"content": "",' in line:
-                        self.line_counter += 1
-                        line = next(infile)
-                    elif '"content":' in line:
-                        matcher = compile_pattern('"content": "(.*)",?').search(line)
-                        if matcher is not None:
-                            self.prompt += ' ' + matcher.group(1)
-
-                    if '"value": ' in line:
-                        matcher = compile_pattern('"value": "(.+)",?').search(line)
-                        if matcher is not None:
-                            self.value_single = str(matcher.group(1))
-
-                self.questions.append(
-                    TextEntryInteraction(self.identifier, self.prompt, self.title,
-                                         self.value_single, True, self.path))
+                yield ChoiceInteraction(self.identifier, self.prompt, self.title,
+                                        self.values, self.choices, self.path)
 
                 self.choices = []
                 self.values = []
 
-                if '"Class": "Poll",' in line:
-                    while '"Class": "Question"' not in line:
-                        self.line_counter += 1
-                        line = next(infile)
-
-            class_type_matcher = compile_pattern('"Class": "(.+Part)",?').search(line)
-            if class_type_matcher is not None and class_type_matcher.group(1) not in self.types:
-                print compile_pattern('"Class": "(.+Part)",?').search(line).group(1) + \
-                      ' type on line ' + str(self.line_counter) + ' has not been implemented'
-
-    def convert(self, class_type=''):
-        if not self.questions:
+            elif class_type == 'SymbolicMathPart':
+                for solution in part.get('solutions') or []:
+                    if solution.get('value'):
+                        self.value_single = self.text(solution['value'])
+
+                yield TextEntryInteraction(self.identifier, self.prompt, self.title,
+                                           self.value_single, True, self.path)
+
+            elif class_type.endswith('Part') and class_type not in self.types:
+                print class_type + ' type in ' + self.identifier + ' has not been implemented'
+
+        self.title = title
+
+    @staticmethod
+    def text(value):
+        """Returns a JSON value as a str, with any text outside ASCII encoded as UTF-8."""
+        if isinstance(value, str):
+            return value
+        if not isinstance(value, unicode):
+            return str(value)
+        return value.encode('utf-8')
+
+    def convert(self, class_type='', lazy=False, workers=1, in_memory=False, compact=False,
+                sink=None, single_package=False, timestamp=None, cache=None, level=None,
+                zip_workers=1):
+        """Converts the questions to QTI packages and writes them to the sink.
+
+        Without a sink, the packages go into a new export zip next to the NTI file. A sink that is
+        given is not closed, so that more can be written to it.
+        With single_package, the sink gets every item and one manifest listing them all instead
+        of a package per item, and the items are always built in memory.
+        With a timestamp, the packages and the export zip are deterministic (see Manifest): the
+        same questions always give the same bytes.
+        With a cache (a PackageCache), only the questions that are not in it are converted, and
+        the packages are built in memory.
+        With a zlib level, the packages and the export zip are deflated at that level; the export
+        zip stores the deflated packages as they are, and deflates its other members in
+        zip_workers threads.
+        """
+        if not lazy and not self.questions:
             raise ValueError('questions[] cannot be empty')
 
         if (isinstance(class_type, str) and class_type) and class_type in globals():
@@ -409,44 +429,153 @@ class NTICollector(object):
         else:
             self.class_type = None
 
-        if self.class_type:
-            for interaction in self.questions:
-                if isinstance(interaction, self.class_type):
-                    interaction.to_qti()
-        else:
-            for interaction in self.questions:
-                interaction.to_qti()
-
-        if not self.path:
-            zip_file = \
-                ZipFile('export-' + datetime.now().strftime('%Y-%m-%d_%H-%M-%S') + '.zip', 'w')
-
-            for question in listdir(dirname(__file__)):
-                if question.endswith('.zip') and not question.startswith('export-'):
-                    zip_file.write(question)
-                    remove(question)
-
-        else:
-            export_path = compile_pattern('([\\/].*[\\/]).*[\\/]').search(self.path).group(1)
-            zip_file = \
-                ZipFile(export_path + 'export-' + datetime.now().strftime('%Y-%m-%d_%H-%M-%S') +
-                        '.zip', 'w')
-
-            for question_name in listdir(dirname(self.path)):
-                question = self.path + question_name
-                zip_file.write(question, question_name)
-
+        if not isinstance(workers, int):
+            raise TypeError('workers needs to be an int type')
+
+        if workers < 1:
+            raise ValueError('workers must be greater than 0')
+
+        if not isinstance(in_memory, bool):
+            raise TypeError('in_memory needs to be a bool type')
+
+        if not isinstance(compact, bool):
+            raise TypeError('compact needs to be a bool type')
+
+        if sink is not None and not hasattr(sink, 'writestr'):
+            raise TypeError('sink needs to have a writestr method')
+
+        if not isinstance(single_package, bool):
+            raise TypeError('single_package needs to be a bool type')
+
+        if timestamp is not None and not isinstance(timestamp, datetime):
+            raise TypeError('timestamp needs to be a datetime type')
+
+        if cache is not None and not isinstance(cache, PackageCache):
+            raise TypeError('cache needs to be a PackageCache type')
+
+        if level is not None:
+            check_level(level)
+
+        # when lazy, every item is written as soon as its question has been read
+        interactions = (interaction for interaction in
+                        (self.iter_questions() if lazy else self.questions)
+                        if not self.class_type or isinstance(interaction, self.class_type))
+
+        out = sink
+        content_package = None
+        try:
+            for package in self.packages(self.unique(interactions), workers, in_memory, compact,
+                                         single_package, timestamp, cache, level):
+                if out is None:
+                    out = ZipSink(export_name(self.path),
+                                  ZIP_STORED if level is None else ZIP_DEFLATED, timestamp, level,
+                                  workers=zip_workers)
+
+                if single_package:
+                    if content_package is None:
+                        content_package = ContentPackage(out, compact=compact, timestamp=timestamp)
+                    content_package.add(*package)
+                elif in_memory or cache is not None:
+                    for name, data in package:
+                        out.writestr(name, data)
+                else:
+                    package_file = open(package, 'rb')
+                    out.writestr(basename(package), package_file.read())
+                    package_file.close()
+                    remove(package)
+
+            if out is None:
+                raise ValueError('questions[] cannot be empty')
+            if content_package is not None:
+                content_package.close()
+        finally:
+            # an item that failed leaves the manifest unfinished, and the export as far as it got
+            if content_package is not None:
+                content_package.discard()
+            if sink is None and out is not None:
+                out.close()
+
+        if self.path and isdir(self.path):
             rmtree(self.path)
 
-    class Word(object):
-
-        def __init__(self, content, wid):
-            if isinstance(content, str):
-                self.content = content
-            else:
-                raise TypeError('content needs to be a str type')
-
-            if isinstance(wid, str):
-                self.wid = wid
-            else:
-                raise TypeError('wid needs to be a str type')
+    @staticmethod
+    def unique(interactions):
+        """Yields the interactions, leaving out any whose title has been seen before.
+
+        A package is named after the title of its item, which assemble() makes different for
+        every part of a question. So a question that occurs twice is only converted once, and two
+        workers never write the same package file.
+        """
+        titles = set()
+        for interaction in interactions:
+            if interaction.title not in titles:
+                titles.add(interaction.title)
+                yield interaction
+
+    @staticmethod
+    def packages(interactions, workers, in_memory, compact=False, single_package=False,
+                 timestamp=None, cache=None, level=None):
+        """Converts the interactions, in a process pool if workers > 1, and yields their
+        packages."""
+        jobs = ((interaction, in_memory, compact, single_package, timestamp, cache, level)
+                for interaction in interactions)
+        if workers == 1:
+            for job in jobs:
+                yield export(job)
+            return
+
+        pool = Pool(workers)
+        try:
+            # imap hands back the packages in the order of the questions
+            for package in pool.imap(export, jobs):
+                yield package
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+    # module level so that interactions holding words can be pickled for worker processes
+    Word = Word
+
+
+def export(job):
+    """Converts one interaction, possibly in a worker process, and returns its package.
+
+    The package is the path of the zip file written by to_qti(), or the (name, data) pairs of
+    the package when it is built in memory. For a single package, it is the (title, interaction
+    type, XML) of the item, to be added to a ContentPackage. With a cache, the package or item
+    is taken from it when it is there, and kept in it otherwise.
+    """
+    interaction, in_memory, compact, single_package, timestamp, cache, level = job
+    if not (in_memory or single_package or cache):
+        return interaction.to_qti(compact=compact, timestamp=timestamp, level=level)
+
+    data = None
+    if cache is not None:
+        key = cache.key(interaction, compact, single_package, timestamp, level)
+        data = cache.get(key)
+    if data is None:
+        data = interaction.to_qti_bytes(compact, packaged=not single_package,
+                                        timestamp=timestamp, level=level)
+        if cache is not None:
+            cache.put(key, data)
+
+    if single_package:
+        return interaction.title, interaction.interaction_type, data
+    return [(interaction.title + '.zip', data)]
+
+
+def export_name(path, extension='.zip'):
+    """Returns a timestamped name for an export, next to the directory an NTI file is read into."""
+    name = 'export-' + datetime.now().strftime('%Y-%m-%d_%H-%M-%S') + extension
+    if path:
+        name = compile_pattern('([\\/].*[\\/]).*[\\/]').search(path).group(1) + name
+    return name
+
+
+def parse(job):
+    """Parses one shard of question spans in a worker process and returns its interactions."""
+    collector, spans = job
+    return collector.parse(spans)
@@ -1,120 +1,166 @@
-from copy import deepcopy
-
 from io import open as open_file
 
-from itertools import product
-
-from json import dumps
-from json import loads
-
 from re import compile as compile_pattern
 from re import sub
 from re import split
 
 from string import ascii_uppercase
 
-from xml.dom.minidom import parseString
-
 from xml.etree.ElementTree import Element
 from xml.etree.ElementTree import SubElement
-from xml.etree.ElementTree import tostring
+
+from encoder import encode
 
 from manifest import Manifest
 
+from writer import Fragment
+from writer import to_xml
+from writer import write_xml
 
-class ChoiceInteraction(object):
 
-    def __init__(self, identifier, prompt, title, values, choices, path=''):
-        if isinstance(identifier, str):
-            self.identifier = identifier
-        else:
-            raise TypeError('identifier needs to be a str type')
+class Field(object):
+    """One validated constructor argument of an interaction.
 
-        if isinstance(prompt, str):
-            self.prompt = prompt
-        else:
-            raise TypeError('prompt needs to be a str type')
+    :param str name: The name of the argument, and of the attribute it is stored in.
+    :param kind: The type the value needs to be.
+    :param bool empty: Whether the value may be empty (or False).
+    :param items: The type the items of a list value need to be, if it is checked.
+    """
 
-        if isinstance(title, str):
-            if not title:
-                self.title = identifier
-            else:
-                self.title = title
-        else:
-            raise TypeError('title needs to be a str type')
+    __slots__ = ('name', 'kind', 'empty', 'items', 'label')
 
-        if isinstance(values, list):
-            self.values = values
-        else:
-            raise TypeError('values[] needs to be a list type')
+    def __init__(self, name, kind, empty=False, items=None):
+        self.name = name
+        self.kind = kind
+        self.empty = empty
+        self.items = items
+        self.label = name + '[]' if kind is list else name
 
-        if isinstance(choices, list):
-            self.choices = choices
-        else:
-            raise TypeError('choices[] needs to be a list type')
+    def check(self, value):
+        """Returns the value if it is valid, and raises a TypeError or ValueError otherwise."""
+        if not isinstance(value, self.kind):
+            raise TypeError(self.label + ' needs to be a ' + self.kind.__name__ + ' type')
 
-        if isinstance(path, str):
-            self.path = path
-        else:
-            raise TypeError('path needs to be a str type')
+        if not self.empty and not value:
+            raise ValueError(self.label + ' cannot be empty')
+
+        if self.items is not None and not isinstance(value[0], self.items):
+            raise TypeError(self.label + ' can only contain ' + self.items.__name__ +
+                            ' type items')
+
+        return value
+
+
+# the attributes every assessmentItem has
+NAMESPACES = {'xmlns': "http://www.imsglobal.org/xsd/imsqti_v2p2",
+              'xmlns:xsi': "http://www.w3.org/2001/XMLSchema-instance",
+              'xsi:schemaLocation': "http://www.imsglobal.org/xsd/imsqti_v2p2 "
+                                    "http://www.imsglobal.org/xsd/qti/qtiv2p2/imsqti_v2p2.xsd"}
+
+# the elements that are the same in every item, serialized only once
+SCORE = Fragment('outcomeDeclaration', {'identifier': 'SCORE', 'cardinality': 'single',
+                                        'baseType': 'float'})
+MAP_RESPONSE = Fragment('responseProcessing', {
+    'template': "http://www.imsglobal.org/question/qti_v2p2/rptemplates/map_response"})
+MATCH_CORRECT = Fragment('responseProcessing', {
+    'template': "http://www.imsglobal.org/question/qti_v2p2/rptemplates/match_correct"})
+
+
+IDENTIFIER = Field('identifier', str)
+PROMPT = Field('prompt', str)
+TITLE = Field('title', str, empty=True)
+PATH = Field('path', str, empty=True)
+
+
+class Interaction(object):
+    """Base class of the interactions, which are slotted to keep large question banks small.
+
+    Every subclass lists its constructor arguments as fields, in order, and passes them on to
+    this constructor, which validates and stores them. An empty title defaults to the identifier.
+    Subclasses build their QTI item in qti_item() and their NTI question in nti_question().
+    """
 
-        if not identifier:
-            raise ValueError('identifier cannot be empty')
+    __slots__ = ('identifier', 'prompt', 'title', 'path')
 
-        if not prompt:
-            raise ValueError('prompt cannot be empty')
+    fields = (IDENTIFIER, PROMPT, TITLE, PATH)
 
-        if not isinstance(values[0], str):
-            raise TypeError('values[] can only contain str type items')
+    interaction_type = ''
 
-        if not isinstance(choices[0], str):
-            raise TypeError('choices[] can only contain str type items')
+    def __init__(self, *values):
+        for field, value in zip(self.fields, values):
+            setattr(self, field.name, field.check(value))
 
-        if len(values) > 1:
-            self.multiple_answer = True
-        elif len(values) == 1:
-            self.multiple_answer = False
+        if not self.title:
+            self.title = self.identifier
+
+    def assessment_item(self, adaptive, time_dependent):
+        """Returns the root element of the QTI item, which the subclasses fill in."""
+        return Element('assessmentItem', NAMESPACES, identifier=self.identifier, title=self.title,
+                       adaptive=adaptive, timeDependent=time_dependent)
+
+    def to_nti(self, compact=False, sink=None):
+        if sink is not None:
+            sink.writestr(self.title + '.json', self.to_nti_bytes(compact))
         else:
-            raise ValueError('values[] cannot be empty')
+            write_json(self, self.nti_question(), compact)
 
-        if not choices:
-            raise ValueError('choices[] cannot be empty')
+    def to_qti_bytes(self, compact=False, packaged=False, timestamp=None, level=None, **options):
+        """Returns the QTI item as UTF-8 encoded XML, or its zipped package when packaged.
+
+        Nothing is written to disk. The options are the adaptive, time_dependent and, where the
+        interaction has them, shuffle and unique_entries arguments of to_qti(). A packaged item
+        is deterministic when a timestamp is given and deflated when a level is, as for Manifest.
+        """
+        qti = to_xml(self.qti_item(**options), compact=compact)
+        if not packaged:
+            return qti
+        return Manifest(self.title, self.interaction_type, qti=qti, compact=compact,
+                        timestamp=timestamp, level=level).data
+
+    def to_nti_bytes(self, compact=False):
+        """Returns the NTI question as JSON, without writing it to disk."""
+        return json_bytes(self.nti_question(), compact)
 
-        self.char = dict(zip(map(str, range(26)), ascii_uppercase))
 
-    def to_qti(self, adaptive='false', time_dependent='false', shuffle='false'):
-        choices = deepcopy(self.choices)
-        values = deepcopy(self.values)
+class ChoiceInteraction(Interaction):
+
+    __slots__ = ('values', 'choices', 'multiple_answer')
+
+    fields = (IDENTIFIER, PROMPT, TITLE, Field('values', list, items=str),
+              Field('choices', list, items=str), PATH)
+
+    interaction_type = 'choiceInteraction'
+
+    def __init__(self, identifier, prompt, title, values, choices, path=''):
+        super(ChoiceInteraction, self).__init__(identifier, prompt, title, values, choices, path)
+
+        self.multiple_answer = len(values) > 1
 
-        if not choices:
+    def to_qti(self, adaptive='false', time_dependent='false', shuffle='false', sink=None,
+               compact=False, timestamp=None, level=None):
+        assessment_item = self.qti_item(adaptive, time_dependent, shuffle)
+        return package(self, self.interaction_type, assessment_item, sink, compact, timestamp,
+                       level)
+
+    def qti_item(self, adaptive='false', time_dependent='false', shuffle='false'):
+        if not self.choices:
             raise ValueError('choices[] cannot be empty')
 
-        if not values:
+        if not self.values:
             raise ValueError('values[] cannot be empty')
 
-        assessment_item = Element('assessmentItem',
-                                  {'xmlns': "http://www.imsglobal.org/xsd/imsqti_v2p2",
-                                   'xmlns:xsi': "http://www.w3.org/2001/XMLSchema-instance",
-                                   'xsi:schemaLocation':
-                                       "http://www.imsglobal.org/xsd/imsqti_v2p2 "
-                                       "http://www.imsglobal.org/xsd/qti/qtiv2p2/imsqti_v2p2.xsd",
-                                   'identifier': self.identifier,
-                                   'title': self.title,
-                                   'adaptive': adaptive,
-                                   'timeDependent': time_dependent})
+        assessment_item = self.assessment_item(adaptive, time_dependent)
         response_declaration = SubElement(assessment_item, 'responseDeclaration',
                                           {'identifier': 'RESPONSE',
                                            'cardinality':
                                                'multiple' if self.multiple_answer else 'single',
                                            'baseType': 'identifier'})
         correct_response = SubElement(response_declaration, 'correctResponse')
-        while values:
+        for value in self.values:
             correct_response_value = SubElement(correct_response, 'value')
-            correct_response_value.text = self.char[values.pop(0)]
+            correct_response_value.text = to_identifier(int(value))
         # outcome_declaration
-        SubElement(assessment_item, 'outcomeDeclaration', {'identifier': 'SCORE',
-                                                           'cardinality': 'single',
-                                                           'baseType': 'float'})
+        assessment_item.append(SCORE)
         item_body = SubElement(assessment_item, 'itemBody')
         choice_interaction = SubElement(item_body, 'choiceInteraction',
                                         {'responseIdentifier': 'RESPONSE',
@@ -122,505 +168,280 @@ class ChoiceInteraction(object):
                                          'maxChoices': '0' if self.multiple_answer else '1'})
         prompt__sub_element = SubElement(choice_interaction, 'prompt')
         prompt__sub_element.text = self.prompt
-        identifier = 0
-        while choices:
+        for identifier, choice in enumerate(self.choices):
             simple_choice = SubElement(choice_interaction, 'simpleChoice',
-                                       {'identifier': str(self.char[str(identifier)])})
-            simple_choice.text = choices.pop(0)
-            identifier += 1
+                                       {'identifier': to_identifier(identifier)})
+            simple_choice.text = choice
         # response_processing
-        SubElement(assessment_item, 'responseProcessing',
-                   {'template':
-                    "http://www.imsglobal.org/question/qti_v2p2/rptemplates/match_correct"})
-
-        rough_string = tostring(assessment_item)
-        reparsed = parseString(rough_string)
-
-        if not self.path:
-            qti_file = open_file(self.title + '.xml', 'w+', encoding="utf-8")
-        else:
-            qti_file = open_file(self.path + self.title + '.xml', 'w+', encoding="utf-8")
-        qti_file.write(reparsed.toprettyxml(indent="  "))
-        qti_file.close()
-
-        if not self.path:
-            Manifest(self.title, 'choiceInteraction')
-        else:
-            Manifest(self.title, 'choiceInteraction', self.path)
+        assessment_item.append(MATCH_CORRECT)
 
-    def to_nti(self):
-        choices = deepcopy(self.choices)
-        values = deepcopy(self.values)
+        return assessment_item
 
-        mime_type_q = '"application/vnd.nextthought.naquestion"'
-        mime_type_mc = '"application/vnd.nextthought.assessment.multiplechoicepart"'
-        mime_type_mc_ma = \
-            '"application/vnd.nextthought.assessment.multiplechoicemultipleanswerpart"'
-        mime_type_mc_s = '"application/vnd.nextthought.assessment.multiplechoicesolution"'
+    def nti_question(self):
+        mime_type_q = 'application/vnd.nextthought.naquestion'
+        mime_type_mc = 'application/vnd.nextthought.assessment.multiplechoicepart'
+        mime_type_mc_ma = 'application/vnd.nextthought.assessment.multiplechoicemultipleanswerpart'
+        mime_type_mc_s = 'application/vnd.nextthought.assessment.multiplechoicesolution'
         mime_type_mc_ma_s = \
-            '"application/vnd.nextthought.assessment.multiplechoicemultipleanswersolution"'
+            'application/vnd.nextthought.assessment.multiplechoicemultipleanswersolution'
 
-        if not choices:
+        if not self.choices:
             raise ValueError('choices[] cannot be empty')
 
-        if not values:
+        if not self.values:
             raise ValueError('values[] cannot be empty')
 
-        if not isinstance(int(values[0]), int):
-            for place, value in enumerate(values):
-                value = str(self.char.keys()[self.char.values().index(values[place])])
-                values[place] = value
-
-        nti_json = '{"Class":"Question", "MimeType":' + mime_type_q + ', "NTIID":"' + \
-                   self.identifier + '", "content":"' + self.prompt + '", "ntiid":"' + \
-                   self.identifier + '", "parts":[{"Class":' + \
-                   ('"MultipleChoiceMultipleAnswerPart"' if self.multiple_answer
-                    else '"MultipleChoicePart"') + ', "MimeType":' + \
-                   (mime_type_mc_ma if self.multiple_answer else mime_type_mc) + ', "choices":["'
-        while choices:
-            if len(choices) == 1:
-                nti_json += choices.pop(0) + '"], '
-            else:
-                nti_json += choices.pop(0) + '", "'
-        nti_json += '"content":"", "explanation":"", "hints":[], "solutions":[{"Class":' + \
-                    ('"MultipleChoiceMultipleAnswerSolution"' if self.multiple_answer
-                     else '"MultipleChoiceSolution"') + ', "MimeType":' + \
-                    (mime_type_mc_ma_s if self.multiple_answer else mime_type_mc_s) + ', "value":'
-        if len(values) == 1:
-            nti_json += values.pop(0) + ', '
-        else:
-            nti_json += '['
-            while values:
-                if len(values) == 1:
-                    nti_json += values.pop(0) + '], '
-                else:
-                    nti_json += values.pop(0) + ', '
-        nti_json += '"weight":1.0}]}]}'
-
-        parsed = loads(nti_json)
-
-        if not self.path:
-            nti_file = open_file(self.title + '.json', 'w+', encoding="utf-8")
-        else:
-            nti_file = open_file(self.path + self.title + '.json', 'w+', encoding="utf-8")
-        nti_file.write(unicode(dumps(parsed, indent=4, sort_keys=True)))
-        nti_file.close()
+        # the values are choice indexes, or the letter identifiers of the choices
+        values = [int(value) if value.isdigit() else from_identifier(value)
+                  for value in self.values]
 
+        nti_json = {'Class': 'Question', 'MimeType': mime_type_q, 'NTIID': self.identifier,
+                    'content': self.prompt, 'ntiid': self.identifier,
+                    'parts': [{'Class': 'MultipleChoiceMultipleAnswerPart' if self.multiple_answer
+                                        else 'MultipleChoicePart',
+                               'MimeType': mime_type_mc_ma if self.multiple_answer
+                                           else mime_type_mc,
+                               'choices': self.choices, 'content': '', 'explanation': '',
+                               'hints': [],
+                               'solutions': [{'Class': 'MultipleChoiceMultipleAnswerSolution'
+                                                       if self.multiple_answer
+                                                       else 'MultipleChoiceSolution',
+                                              'MimeType': mime_type_mc_ma_s
+                                                          if self.multiple_answer
+                                                          else mime_type_mc_s,
+                                              'value': values if len(values) > 1
+                                                       else values[0],
+                                              'weight': 1.0}]}]}
 
-class ExtendedTextInteraction(object):
+        return nti_json
 
-    def __init__(self, identifier, prompt, title, path=''):
-        if isinstance(identifier, str):
-            self.identifier = identifier
-        else:
-            raise TypeError('identifier needs to be a str type')
 
-        if isinstance(prompt, str):
-            self.prompt = prompt
-        else:
-            raise TypeError('prompt needs to be a str type')
+class ExtendedTextInteraction(Interaction):
 
-        if isinstance(title, str):
-            if not title:
-                self.title = identifier
-            else:
-                self.title = title
-        else:
-            raise TypeError('title needs to be a str type')
+    __slots__ = ()
 
-        if isinstance(path, str):
-            self.path = path
-        else:
-            raise TypeError('path needs to be a str type')
-
-        if not identifier:
-            raise ValueError('identifier cannot be empty')
-
-        if not prompt:
-            raise ValueError('prompt cannot be empty')
-
-    def to_qti(self, adaptive='false', time_dependent='false'):
-        assessment_item = Element('assessmentItem',
-                                  {'xmlns': "http://www.imsglobal.org/xsd/imsqti_v2p2",
-                                   'xmlns:xsi': "http://www.w3.org/2001/XMLSchema-instance",
-                                   'xsi:schemaLocation':
-                                       "http://www.imsglobal.org/xsd/imsqti_v2p2 "
-                                       "http://www.imsglobal.org/xsd/qti/qtiv2p2/imsqti_v2p2.xsd",
-                                   'identifier': self.identifier,
-                                   'title': self.title,
-                                   'adaptive': adaptive,
-                                   'timeDependent': time_dependent})
+    fields = (IDENTIFIER, PROMPT, TITLE, PATH)
+
+    interaction_type = 'extendedTextInteraction'
+
+    def __init__(self, identifier, prompt, title, path=''):
+        super(ExtendedTextInteraction, self).__init__(identifier, prompt, title, path)
+
+    def to_qti(self, adaptive='false', time_dependent='false', sink=None, compact=False,
+               timestamp=None, level=None):
+        assessment_item = self.qti_item(adaptive, time_dependent)
+        return package(self, self.interaction_type, assessment_item, sink, compact, timestamp,
+                       level)
+
+    def qti_item(self, adaptive='false', time_dependent='false'):
+        assessment_item = self.assessment_item(adaptive, time_dependent)
         # response_declaration
         SubElement(assessment_item, 'responseDeclaration', {'identifier': 'RESPONSE',
                                                             'cardinality': 'single',
                                                             'baseType': 'string'})
         # outcome_declaration
-        SubElement(assessment_item, 'outcomeDeclaration', {'identifier': 'SCORE',
-                                                           'cardinality': 'single',
-                                                           'baseType': 'float'})
+        assessment_item.append(SCORE)
         item_body = SubElement(assessment_item, 'itemBody')
         extended_text_interaction = SubElement(item_body, 'extendedTextInteraction',
                                                {'responseIdentifier': 'RESPONSE'})
         prompt__sub_element = SubElement(extended_text_interaction, 'prompt')
         prompt__sub_element.text = self.prompt
 
-        rough_string = tostring(assessment_item)
-        reparsed = parseString(rough_string)
-
-        if not self.path:
-            qti_file = open_file(self.title + '.xml', 'w+', encoding="utf-8")
-        else:
-            qti_file = open_file(self.path + self.title + '.xml', 'w+', encoding="utf-8")
-        qti_file.write(reparsed.toprettyxml(indent="  "))
-        qti_file.close()
-
-        if not self.path:
-            Manifest(self.title, 'extendedTextInteraction')
-        else:
-            Manifest(self.title, 'extendedTextInteraction', self.path)
-
-    def to_nti(self):
-        mime_type_q = '"application/vnd.nextthought.naquestion"'
-        mime_type_model = '"application/vnd.nextthought.assessment.modeledcontentpart"'
-
-        nti_json = '{"Class":"Question", "MimeType":' + mime_type_q + ', "NTIID":"' + \
-                   self.identifier + '", "content":"' + self.prompt + '", "ntiid":"' + \
-                   self.identifier + '", "parts":[{"Class":"ModeledContentPart", "MimeType":' + \
-                   mime_type_model + ', "content":"", "explanation":"", "hints":[], ' \
-                   '"solutions":[]}]}'
-
-        parsed = loads(nti_json)
-
-        if not self.path:
-            nti_file = open_file(self.title + '.json', 'w+', encoding="utf-8")
-        else:
-            nti_file = open_file(self.path + self.title + '.json', 'w+', encoding="utf-8")
-        nti_file.write(unicode(dumps(parsed, indent=4, sort_keys=True)))
-        nti_file.close()
-
-
-class InlineChoiceInteraction(object):
-
-    def __init__(self, identifier, prompt, title, labels, solutions, wordbank, nti, path=''):
-        if isinstance(identifier, str):
-            self.identifier = identifier
-        else:
-            raise TypeError('identifier needs to be a str type')
-
-        if isinstance(prompt, str):
-            self.prompt = prompt
-        else:
-            raise TypeError('prompt needs to be a str type')
+        return assessment_item
 
-        if isinstance(title, str):
-            if not title:
-                self.title = identifier
-            else:
-                self.title = title
-        else:
-            raise TypeError('title needs to be a str type')
+    def nti_question(self):
+        mime_type_q = 'application/vnd.nextthought.naquestion'
+        mime_type_model = 'application/vnd.nextthought.assessment.modeledcontentpart'
 
-        if isinstance(labels, list):
-            self.labels = labels
-        else:
-            raise TypeError('labels[] needs to be a list type')
+        nti_json = {'Class': 'Question', 'MimeType': mime_type_q, 'NTIID': self.identifier,
+                    'content': self.prompt, 'ntiid': self.identifier,
+                    'parts': [{'Class': 'ModeledContentPart', 'MimeType': mime_type_model,
+                               'content': '', 'explanation': '', 'hints': [], 'solutions': []}]}
 
-        if isinstance(solutions, list):
-            self.solutions = solutions
-        else:
-            raise TypeError('solutions[] needs to be a list type')
+        return nti_json
 
-        if isinstance(wordbank, list):
-            self.wordbank = wordbank
-        else:
-            raise TypeError('wordbank[] needs to be a list type')
 
-        if isinstance(nti, bool):
-            self.nti = nti
-        else:
-            raise TypeError('nti needs to be a bool type')
+class InlineChoiceInteraction(Interaction):
 
-        if isinstance(path, str):
-            self.path = path
-        else:
-            raise TypeError('path needs to be a str type')
+    __slots__ = ('labels', 'solutions', 'wordbank', 'nti')
 
-        if not identifier:
-            raise ValueError('identifier cannot be empty')
+    fields = (IDENTIFIER, PROMPT, TITLE, Field('labels', list), Field('solutions', list),
+              Field('wordbank', list), Field('nti', bool, empty=True), PATH)
 
-        if not prompt:
-            raise ValueError('prompt cannot be empty')
+    interaction_type = 'inlineChoiceInteraction'
 
-        if not labels:
-            raise ValueError('labels[] cannot be empty')
+    blank_pattern = compile_pattern(r'<input type=\\?"blankfield\\?" name=\\?"\d{3}\\?" />')
 
-        if not solutions:
-            raise ValueError('solutions[] cannot be empty')
-
-        if not wordbank:
-            raise ValueError('wordbank[] cannot be empty')
+    def __init__(self, identifier, prompt, title, labels, solutions, wordbank, nti, path=''):
+        super(InlineChoiceInteraction, self).__init__(identifier, prompt, title, labels,
+                                                      solutions, wordbank, nti, path)
 
         if len(labels) != len(solutions):
             raise ValueError('labels[] must have the same length as solutions[]')
 
-        self.content = ''
-        self.input = ''
+    def to_qti(self, adaptive='false', time_dependent='false', shuffle='false', sink=None,
+               compact=False, unique_entries=False, timestamp=None,
+               level=None):
+        assessment_item = self.qti_item(adaptive, time_dependent, shuffle, unique_entries)
+        return package(self, self.interaction_type, assessment_item, sink, compact, timestamp,
+                       level)
 
-        self.char = self.dictionary(1)
-        self.double_char = self.dictionary(2)
+    def qti_item(self, adaptive='false', time_dependent='false', shuffle='false',
+                 unique_entries=False):
+        """Returns the assessmentItem element of the interaction.
 
-    def to_qti(self, adaptive='false', time_dependent='false', shuffle='false'):
-        labels = deepcopy(self.labels)
-        solutions = deepcopy(self.solutions)
-        wordbank = deepcopy(self.wordbank)
+        The mapping of every blank lists the solution of every blank, so a solution shared by
+        several blanks is listed several times. With unique_entries, it is listed once.
+        """
+        labels = self.labels
 
         if not labels:
             raise ValueError('labels[] cannot be empty')
 
-        if not solutions:
+        if not self.solutions:
             raise ValueError('solutions[] cannot be empty')
 
-        if not wordbank:
+        if not self.wordbank:
             raise ValueError('wordbank[] cannot be empty')
 
-        prompt_pattern = compile_pattern('<input type=\\\\"blankfield\\\\" name=\\\\"\d{3}\\\\" />')
-        mod_prompt = split(prompt_pattern, self.prompt)
-
-        assessment_item = Element('assessmentItem',
-                                  {'xmlns': "http://www.imsglobal.org/xsd/imsqti_v2p2",
-                                   'xmlns:xsi': "http://www.w3.org/2001/XMLSchema-instance",
-                                   'xsi:schemaLocation':
-                                       "http://www.imsglobal.org/xsd/imsqti_v2p2 "
-                                       "http://www.imsglobal.org/xsd/qti/qtiv2p2/imsqti_v2p2.xsd",
-                                   'identifier': self.identifier,
-                                   'title': self.title,
-                                   'adaptive': adaptive,
-                                   'timeDependent': time_dependent})
-        for item in range(len(self.labels)):
+        mod_prompt = split(self.blank_pattern, self.prompt)
+
+        # the wrong and the right map entry of every solution, shared by all the blanks
+        solutions = [to_identifier(int(solution)) for solution in self.solutions]
+        entries = {}
+        unique = []
+        for solution in solutions:
+            if solution not in entries:
+                entries[solution] = (Fragment('mapEntry', mapKey=solution, mappedValue='0'),
+                                     Fragment('mapEntry', mapKey=solution, mappedValue='1'))
+                unique.append(solution)
+        keys = unique if unique_entries else solutions
+
+        assessment_item = self.assessment_item(adaptive, time_dependent)
+        for label, solution in zip(labels, solutions):
             response_declaration = SubElement(assessment_item, 'responseDeclaration', {
-                'identifier': 'RESPONSE' + str(labels[item]), 'cardinality': 'single', 'baseType':
+                'identifier': 'RESPONSE' + str(label), 'cardinality': 'single', 'baseType':
                     'identifier'
             })
             correct_response = SubElement(response_declaration, 'correctResponse')
             value = SubElement(correct_response, 'value')
-            value.text = self.char[solutions[item]]
+            value.text = solution
             mapping = SubElement(response_declaration, 'mapping')
-            for num in range(len(self.labels)):
-                if self.char[solutions[item]] == self.char[solutions[num]]:
-                    # map_entry
-                    SubElement(mapping, 'mapEntry', {
-                        'mapKey': self.char[solutions[num]], 'mappedValue': '1'})
-                else:
-                    # map_entry
-                    SubElement(mapping, 'mapEntry', {
-                        'mapKey': self.char[solutions[num]], 'mappedValue': '0'})
+            mapping.extend(entries[key][key == solution] for key in keys)
         # outcome_declaration
-        SubElement(assessment_item, 'outcomeDeclaration', {'identifier': 'SCORE',
-                                                           'cardinality': 'single',
-                                                           'baseType': 'float'})
+        assessment_item.append(SCORE)
         item_body = SubElement(assessment_item, 'itemBody')
         prompt = SubElement(item_body, 'p')
-        prompt.text = mod_prompt.pop(0)
-        while labels:
+        prompt.text = mod_prompt[0]
+        # the same choices are offered in every blank
+        wordbank = []
+        for word in self.wordbank:
+            inline_choice = Fragment('inlineChoice', identifier=to_identifier(int(word.wid)))
+            inline_choice.text = word.content
+            wordbank.append(inline_choice)
+        for index, label in enumerate(labels):
             inline_choice_interaction = SubElement(prompt, 'inlineChoiceInteraction', {
-                'responseIdentifier': 'RESPONSE' + str(labels.pop(0)), 'shuffle': shuffle
+                'responseIdentifier': 'RESPONSE' + str(label), 'shuffle': shuffle
             })
-            for num in range(len(wordbank)):
-                inline_choice = SubElement(inline_choice_interaction, 'inlineChoice', {
-                    'identifier': self.char[wordbank[num].wid]
-                })
-                inline_choice.text = wordbank[num].content
-            inline_choice_interaction.tail = mod_prompt.pop(0)
+            inline_choice_interaction.extend(wordbank)
+            inline_choice_interaction.tail = mod_prompt[index + 1]
         # response_processing
-        SubElement(assessment_item, 'responseProcessing',
-                   {'template':
-                    "http://www.imsglobal.org/question/qti_v2p2/rptemplates/map_response"})
+        assessment_item.append(MAP_RESPONSE)
 
-        rough_string = tostring(assessment_item)
-        reparsed = parseString(rough_string)
+        return assessment_item
 
-        if not self.path:
-            qti_file = open_file(self.title + '.xml', 'w+', encoding="utf-8")
-        else:
-            qti_file = open_file(self.path + self.title + '.xml', 'w+', encoding="utf-8")
-        qti_file.write(reparsed.toprettyxml(indent="  "))
-        qti_file.close()
-
-        if not self.path:
-            Manifest(self.title, 'inlineChoiceInteraction')
-        else:
-            Manifest(self.title, 'inlineChoiceInteraction', self.path)
-
-    def to_nti(self):
-        labels = deepcopy(self.labels)
-        solutions = deepcopy(self.solutions)
-        wordbank = deepcopy(self.wordbank)
-
-        mime_type_q = '"application/vnd.nextthought.naquestionfillintheblankwordbank"'
-        mime_type_b = '"application/vnd.nextthought.assessment.fillintheblankwithwordbankpart"'
-        mime_type_b_s = \
-            '"application/vnd.nextthought.assessment.fillintheblankwithwordbanksolution"'
-        mime_type_w = '"application/vnd.nextthought.naqwordbank"'
-        mime_type_we = '"application/vnd.nextthought.naqwordentry"'
+    def nti_question(self):
+        mime_type_q = 'application/vnd.nextthought.naquestionfillintheblankwordbank'
+        mime_type_b = 'application/vnd.nextthought.assessment.fillintheblankwithwordbankpart'
+        mime_type_b_s = 'application/vnd.nextthought.assessment.fillintheblankwithwordbanksolution'
+        mime_type_w = 'application/vnd.nextthought.naqwordbank'
+        mime_type_we = 'application/vnd.nextthought.naqwordentry'
 
         if compile_pattern('<a.*></a> ').match(self.prompt) is not None:
-            self.input = sub('<a.*></a> ', '', self.prompt)
+            nti_input = sub('<a.*></a> ', '', self.prompt)
             prompt_mod = compile_pattern('(<a.*></a>).*').match(self.prompt).group(1)
         else:
+            nti_input = ''
             prompt_mod = self.prompt
 
-        if not labels:
+        if not self.labels:
             raise ValueError('labels[] cannot be empty')
 
-        if not solutions:
+        if not self.solutions:
             raise ValueError('solutions[] cannot be empty')
 
-        if not wordbank:
+        if not self.wordbank:
             raise ValueError('wordbank[] cannot be empty')
 
-        nti_json = '{"Class":"Question", "MimeType":' + mime_type_q + ', "NTIID":"' + \
-                   self.identifier + '", "content":"' + prompt_mod + '", "ntiid":"' + \
-                   self.identifier + '", "parts":[{"Class":"FillInTheBlankWithWordBankPart", ' \
-                   '"MimeType":' + mime_type_b + ', "content":"", "explanation":"", "hints":[], ' \
-                   '"input":"' + self.input + '", "solutions":[{"Class":' \
-                   '"FillInTheBlankWithWordBankSolution", "MimeType":' + mime_type_b_s + \
-                   ', "value":{'
-        while labels:
-            nti_json += '"' + labels.pop(0) + '":["' + solutions.pop(0) + '"]'
-            if len(labels) != 0:
-                nti_json += ','
-        nti_json += '}, "weight":1.0}], "wordbank":{"Class":"WordBank", "MimeType":' + mime_type_w \
-                    + ', "entries":['
-        while wordbank:
-            nti_json += '{"Class":"WordEntry", "MimeType":' + mime_type_we + ', "content":"' + \
-                        wordbank[0].content + '", "lang":"en", "wid":"' + wordbank[0].wid + '", ' \
-                        '"word":"' + wordbank.pop(0).content + '"}'
-            if len(wordbank) >= 1:
-                nti_json += ','
-        nti_json += '], "unique":true}}], "wordbank":null}'
-
-        parsed = loads(nti_json)
-
-        if not self.path:
-            nti_file = open_file(self.title + '.json', 'w+', encoding="utf-8")
-        else:
-            nti_file = open_file(self.path + self.title + '.json', 'w+', encoding="utf-8")
-        nti_file.write(unicode(dumps(parsed, indent=4, sort_keys=True)))
-        nti_file.close()
-
-    @staticmethod
-    def dictionary(size):
-        if size < 1:
-            raise ValueError('size must be greater than 0')
-        pre_dict = []
-        for char in product(ascii_uppercase, repeat=size):
-            pre_dict.append("".join(char))
-        return dict(zip(map(str, range(26 ** size)), pre_dict))
+        value = dict((label, [solution]) for label, solution in zip(self.labels, self.solutions))
+        entries = [{'Class': 'WordEntry', 'MimeType': mime_type_we, 'content': word.content,
+                    'lang': 'en', 'wid': word.wid, 'word': word.content}
+                   for word in self.wordbank]
 
+        nti_json = {'Class': 'Question', 'MimeType': mime_type_q, 'NTIID': self.identifier,
+                    'content': prompt_mod, 'ntiid': self.identifier,
+                    'parts': [{'Class': 'FillInTheBlankWithWordBankPart', 'MimeType': mime_type_b,
+                               'content': '', 'explanation': '', 'hints': [], 'input': nti_input,
+                               'solutions': [{'Class': 'FillInTheBlankWithWordBankSolution',
+                                              'MimeType': mime_type_b_s, 'value': value,
+                                              'weight': 1.0}],
+                               'wordbank': {'Class': 'WordBank', 'MimeType': mime_type_w,
+                                            'entries': entries, 'unique': True}}],
+                    'wordbank': None}
 
-class MatchInteraction(object):
+        return nti_json
 
-    def __init__(self, identifier, prompt, title, labels, solutions, values, path=''):
-        if isinstance(identifier, str):
-            self.identifier = identifier
-        else:
-            raise TypeError('identifier needs to be a str type')
-
-        if isinstance(prompt, str):
-            self.prompt = prompt
-        else:
-            raise TypeError('prompt needs to be a str type')
-
-        if isinstance(title, str):
-            if not title:
-                self.title = identifier
-            else:
-                self.title = title
-        else:
-            raise TypeError('title needs to be a str type')
-
-        if isinstance(labels, list):
-            self.labels = labels
-        else:
-            raise TypeError('labels[] needs to be a list type')
 
-        if isinstance(solutions, list):
-            self.solutions = solutions
-        else:
-            raise TypeError('solutions[] needs to be a list type')
+class MatchInteraction(Interaction):
 
-        if isinstance(values, list):
-            self.values = values
-        else:
-            raise TypeError('values[] needs to be a list type')
+    __slots__ = ('labels', 'solutions', 'values')
 
-        if isinstance(path, str):
-            self.path = path
-        else:
-            raise TypeError('path needs to be a str type')
+    fields = (IDENTIFIER, PROMPT, TITLE, Field('labels', list), Field('solutions', list),
+              Field('values', list), PATH)
 
-        if not identifier:
-            raise ValueError('identifier cannot be empty')
+    interaction_type = 'matchInteraction'
 
-        if not prompt:
-            raise ValueError('prompt cannot be empty')
+    solution_pattern = compile_pattern('(.+) (.+)')
 
-        if not labels:
-            raise ValueError('labels[] cannot be empty')
-
-        if not solutions:
-            raise ValueError('solutions[] cannot be empty')
-
-        if not values:
-            raise ValueError('values[] cannot be empty')
+    def __init__(self, identifier, prompt, title, labels, solutions, values, path=''):
+        super(MatchInteraction, self).__init__(identifier, prompt, title, labels, solutions,
+                                               values, path)
 
         if len(labels) != len(values):
             raise ValueError('labels[] must have the same length as values[]')
 
-        self.solution_pattern = compile_pattern('(.+) (.+)')
-
-        self.char = self.dictionary(1)
-        self.double_char = self.dictionary(2)
-
-    def to_qti(self, adaptive='false', time_dependent='false', shuffle='false'):
-        labels = deepcopy(self.labels)
-        solutions = deepcopy(self.solutions)
-        values = deepcopy(self.values)
+    def to_qti(self, adaptive='false', time_dependent='false', shuffle='false', sink=None,
+               compact=False, timestamp=None, level=None):
+        assessment_item = self.qti_item(adaptive, time_dependent, shuffle)
+        return package(self, self.interaction_type, assessment_item, sink, compact, timestamp,
+                       level)
 
-        if not labels:
+    def qti_item(self, adaptive='false', time_dependent='false', shuffle='false'):
+        if not self.labels:
             raise ValueError('labels[] cannot be empty')
 
-        if not solutions:
+        if not self.solutions:
             raise ValueError('solutions[] cannot be empty')
 
-        if not values:
+        if not self.values:
             raise ValueError('values[] cannot be empty')
 
-        assessment_item = Element('assessmentItem',
-                                  {'xmlns': "http://www.imsglobal.org/xsd/imsqti_v2p2",
-                                   'xmlns:xsi': "http://www.w3.org/2001/XMLSchema-instance",
-                                   'xsi:schemaLocation':
-                                       "http://www.imsglobal.org/xsd/imsqti_v2p2 "
-                                       "http://www.imsglobal.org/xsd/qti/qtiv2p2/imsqti_v2p2.xsd",
-                                   'identifier': self.identifier,
-                                   'title': self.title,
-                                   'adaptive': adaptive,
-                                   'timeDependent': time_dependent})
+        # the values are numbered after the labels so that their identifiers never collide
+        first_value = max(26, len(self.labels))
+
+        assessment_item = self.assessment_item(adaptive, time_dependent)
         response_declaration = SubElement(assessment_item, 'responseDeclaration',
                                           {'identifier': 'RESPONSE',
                                            'cardinality': 'multiple',
                                            'baseType': 'directedPair'})
         correct_response = SubElement(response_declaration, 'correctResponse')
-        while solutions:
-            matcher = self.solution_pattern.search(solutions[0])
+        for solution in self.solutions:
+            matcher = self.solution_pattern.search(solution)
             correct_response_value = SubElement(correct_response, 'value')
-            correct_response_value.text = str(self.char[str(matcher.group(1))] + ' ' +
-                                              self.double_char[str(matcher.group(2))])
-            solutions.pop(0)
+            correct_response_value.text = to_identifier(int(matcher.group(1))) + ' ' + \
+                to_identifier(first_value + int(matcher.group(2)))
         # outcome_declaration
-        SubElement(assessment_item, 'outcomeDeclaration', {'identifier': 'SCORE',
-                                                           'cardinality': 'single',
-                                                           'baseType': 'float'})
+        assessment_item.append(SCORE)
         item_body = SubElement(assessment_item, 'itemBody')
         match_interaction = SubElement(item_body, 'matchInteraction', {'responseIdentifier':
                                                                        'RESPONSE',
@@ -629,183 +450,84 @@ class MatchInteraction(object):
         prompt__sub_element = SubElement(match_interaction, 'prompt')
         prompt__sub_element.text = self.prompt
         simple_match_set_1 = SubElement(match_interaction, 'simpleMatchSet')
-        identifier = 0
-        while labels:
+        for identifier, label in enumerate(self.labels):
             simple_associable_choice = SubElement(simple_match_set_1, 'simpleAssociableChoice',
-                                                  {'identifier': self.char[str(identifier)],
+                                                  {'identifier': to_identifier(identifier),
                                                    'matchMax': '1'})
-            simple_associable_choice.text = labels.pop(0)
-            identifier += 1
+            simple_associable_choice.text = label
         simple_match_set_2 = SubElement(match_interaction, 'simpleMatchSet')
-        identifier = 0
-        while values:
+        for identifier, value in enumerate(self.values, first_value):
             simple_associable_choice = SubElement(simple_match_set_2, 'simpleAssociableChoice',
-                                                  {'identifier': self.double_char[str(identifier)],
+                                                  {'identifier': to_identifier(identifier),
                                                    'matchMax': '1'})
-            simple_associable_choice.text = values.pop(0)
-            identifier += 1
+            simple_associable_choice.text = value
         # response_processing
-        SubElement(assessment_item, 'responseProcessing',
-                   {'template':
-                    "http://www.imsglobal.org/question/qti_v2p2/rptemplates/match_correct"})
+        assessment_item.append(MATCH_CORRECT)
 
-        rough_string = tostring(assessment_item)
-        reparsed = parseString(rough_string)
+        return assessment_item
 
-        if not self.path:
-            qti_file = open_file(self.title + '.xml', 'w+', encoding="utf-8")
-        else:
-            qti_file = open_file(self.path + self.title + '.xml', 'w+', encoding="utf-8")
-        qti_file.write(reparsed.toprettyxml(indent="  "))
-        qti_file.close()
-
-        if not self.path:
-            Manifest(self.title, 'matchInteraction')
-        else:
-            Manifest(self.title, 'matchInteraction', self.path)
+    def nti_question(self):
+        mime_type_q = 'application/vnd.nextthought.naquestion'
+        mime_type_ma = 'application/vnd.nextthought.assessment.matchingpart'
+        mime_type_ma_s = 'application/vnd.nextthought.assessment.matchingsolution'
 
-    def to_nti(self):
-        labels = deepcopy(self.labels)
-        solutions = deepcopy(self.solutions)
-        values = deepcopy(self.values)
-
-        mime_type_q = '"application/vnd.nextthought.naquestion"'
-        mime_type_ma = '"application/vnd.nextthought.assessment.matchingpart"'
-        mime_type_ma_s = '"application/vnd.nextthought.assessment.matchingsolution"'
-
-        if not labels:
+        if not self.labels:
             raise ValueError('labels[] cannot be empty')
 
-        if not solutions:
+        if not self.solutions:
             raise ValueError('solutions[] cannot be empty')
 
-        if not values:
+        if not self.values:
             raise ValueError('values[] cannot be empty')
 
-        nti_json = '{"Class":"Question", "MimeType":' + mime_type_q + ', "NTIID":"' + \
-                   self.identifier + '", "content":"' + self.prompt + '", "ntiid":"' + \
-                   self.identifier + '", "parts":[{"Class":"MatchingPart", "MimeType":' + \
-                   mime_type_ma + ', "content":"", "explanation":"", "hints":[], "labels":["'
-        while labels:
-            if len(labels) == 1:
-                nti_json += labels.pop(0) + '"], '
-            else:
-                nti_json += labels.pop(0) + '", "'
-        nti_json += \
-            '"solutions":[{"Class":"MatchingSolution", "MimeType":' + mime_type_ma_s + ', "value":{'
-        while solutions:
-            matcher = self.solution_pattern.search(solutions[0])
-            if len(solutions) == 1:
-                nti_json += '"' + matcher.group(1) + '":' + matcher.group(2) + '}, '
-            else:
-                nti_json += '"' + matcher.group(1) + '":' + matcher.group(2) + ', '
-            solutions.pop(0)
-        nti_json += '"weight":1.0}], "values":["'
-        while values:
-            if len(values) == 1:
-                nti_json += values.pop(0) + '"]}]}'
-            else:
-                nti_json += values.pop(0) + '", "'
+        value = {}
+        for solution in self.solutions:
+            matcher = self.solution_pattern.search(solution)
+            value[matcher.group(1)] = int(matcher.group(2))
 
-        parsed = loads(nti_json)
+        nti_json = {'Class': 'Question', 'MimeType': mime_type_q, 'NTIID': self.identifier,
+                    'content': self.prompt, 'ntiid': self.identifier,
+                    'parts': [{'Class': 'MatchingPart', 'MimeType': mime_type_ma, 'content': '',
+                               'explanation': '', 'hints': [], 'labels': self.labels,
+                               'solutions': [{'Class': 'MatchingSolution',
+                                              'MimeType': mime_type_ma_s, 'value': value,
+                                              'weight': 1.0}],
+                               'values': self.values}]}
 
-        if not self.path:
-            nti_file = open_file(self.title + '.json', 'w+', encoding="utf-8")
-        else:
-            nti_file = open_file(self.path + self.title + '.json', 'w+', encoding="utf-8")
-        nti_file.write(unicode(dumps(parsed, indent=4, sort_keys=True)))
-        nti_file.close()
-
-    @staticmethod
-    def dictionary(size):
-        if size < 1:
-            raise ValueError('size must be greater than 0')
-        pre_dict = []
-        for char in product(ascii_uppercase, repeat=size):
-            pre_dict.append("".join(char))
-        return dict(zip(map(str, range(26 ** size)), pre_dict))
+        return nti_json
 
 
-class TextEntryInteraction(object):
+class TextEntryInteraction(Interaction):
 
-    def __init__(self, identifier, prompt, title, values, math=False, path=''):
-        if isinstance(identifier, str):
-            self.identifier = identifier
-        else:
-            raise TypeError('identifier needs to be a str type')
-
-        if isinstance(prompt, str):
-            self.prompt = prompt
-        else:
-            raise TypeError('prompt needs to be a str type')
-
-        if isinstance(title, str):
-            if not title:
-                self.title = identifier
-            else:
-                self.title = title
-        else:
-            raise TypeError('title needs to be a str type')
-
-        if isinstance(math, bool):
-            self.math = math
-        else:
-            raise TypeError('math needs to be a bool type')
-
-        if not self.math:
-            if isinstance(values, list):
-                self.values = values
-            else:
-                raise TypeError('values[] needs to be a list type')
-        if self.math:
-            if isinstance(values, str):
-                self.values = values
-            else:
-                raise TypeError('values needs to be a str type')
+    __slots__ = ('values', 'math')
 
-        if isinstance(path, str):
-            self.path = path
-        else:
-            raise TypeError('path needs to be a str type')
+    fields = (IDENTIFIER, PROMPT, TITLE, Field('math', bool, empty=True), PATH)
 
-        if not identifier:
-            raise ValueError('identifier cannot be empty')
+    interaction_type = 'textEntryInteraction'
 
-        if not prompt:
-            raise ValueError('prompt cannot be empty')
+    # the values are a list of answers, or a single LaTeX answer when math is set
+    text_values = Field('values', list, items=str)
+    math_values = Field('values', str)
 
-        if not self.math:
-            if not values:
-                raise ValueError('values[] cannot be empty')
-        if self.math:
-            if not values:
-                raise ValueError('values cannot be empty')
+    def __init__(self, identifier, prompt, title, values, math=False, path=''):
+        super(TextEntryInteraction, self).__init__(identifier, prompt, title, math, path)
 
-        if not self.math:
-            if not isinstance(values[0], str):
-                raise TypeError('values[] can only contain str type items')
+        self.values = (self.math_values if math else self.text_values).check(values)
 
-        if self.math:
-            self.content = ''
+    def to_qti(self, adaptive='false', time_dependent='false', sink=None, compact=False,
+               timestamp=None, level=None):
+        assessment_item = self.qti_item(adaptive, time_dependent)
+        return package(self, self.interaction_type, assessment_item, sink, compact, timestamp,
+                       level)
 
-    def to_qti(self, adaptive='false', time_dependent='false'):
+    def qti_item(self, adaptive='false', time_dependent='false'):
         length = str(len(self.values))
         new_prompt = split('_+', self.prompt)
-        values = deepcopy(self.values)
 
         if not self.math:
             length = str(self.prompt.count('_'))
 
-        assessment_item = Element('assessmentItem',
-                                  {'xmlns': "http://www.imsglobal.org/xsd/imsqti_v2p2",
-                                   'xmlns:xsi': "http://www.w3.org/2001/XMLSchema-instance",
-                                   'xsi:schemaLocation':
-                                       "http://www.imsglobal.org/xsd/imsqti_v2p2 "
-                                       "http://www.imsglobal.org/xsd/qti/qtiv2p2/imsqti_v2p2.xsd",
-                                   'identifier': self.identifier,
-                                   'title': self.title,
-                                   'adaptive': adaptive,
-                                   'timeDependent': time_dependent})
+        assessment_item = self.assessment_item(adaptive, time_dependent)
         response_declaration = SubElement(assessment_item, 'responseDeclaration',
                                           {'identifier': 'RESPONSE',
                                            'cardinality': 'single',
@@ -813,198 +535,199 @@ class TextEntryInteraction(object):
         correct_response = SubElement(response_declaration, 'correctResponse')
         correct_response_value = SubElement(correct_response, 'value')
         if not self.math:
-            correct_response_value.text = values[0]
+            correct_response_value.text = self.values[0]
             mapping = SubElement(response_declaration, 'mapping')
-            while values:
+            for value in self.values:
                 # map_entry
-                SubElement(mapping, 'mapEntry', {'mapKey': values.pop(0), 'mappedValue': '1'})
+                SubElement(mapping, 'mapEntry', {'mapKey': value, 'mappedValue': '1'})
         if self.math:
             correct_response_value.text = self.values
         # outcome_declaration
-        SubElement(assessment_item, 'outcomeDeclaration', {'identifier': 'SCORE',
-                                                           'cardinality': 'single',
-                                                           'baseType': 'float'})
+        assessment_item.append(SCORE)
         item_body = SubElement(assessment_item, 'itemBody')
         prompt = SubElement(item_body, 'p')
         if not self.math:
-            prompt.text = new_prompt.pop(0)
+            prompt.text = new_prompt[0]
         if self.math:
             prompt.text = self.prompt
         text_entry_interaction = SubElement(prompt, 'textEntryInteraction',
                                             {'responseIdentifier': 'RESPONSE',
                                              'expectedLength': length})
-        if not self.math and new_prompt:
-            text_entry_interaction.tail = new_prompt.pop(0)
+        if not self.math and len(new_prompt) > 1:
+            text_entry_interaction.tail = new_prompt[1]
         if not self.math:
             # response_processing
-            SubElement(assessment_item, 'responseProcessing',
-                       {'template':
-                        'http://www.imsglobal.org/question/qti_v2p2/rptemplates/map_response'})
+            assessment_item.append(MAP_RESPONSE)
         if self.math:
             # response_processing
-            SubElement(assessment_item, 'responseProcessing',
-                       {'template':
-                        'http://www.imsglobal.org/question/qti_v2p2/rptemplates/match_correct'})
+            assessment_item.append(MATCH_CORRECT)
 
-        rough_string = tostring(assessment_item)
-        reparsed = parseString(rough_string)
+        return assessment_item
 
-        if not self.path:
-            qti_file = open_file(self.title + '.xml', 'w+', encoding="utf-8")
-        else:
-            qti_file = open_file(self.path + self.title + '.xml', 'w+', encoding="utf-8")
-        qti_file.write(reparsed.toprettyxml(indent="  "))
-        qti_file.close()
+    def nti_question(self):
+        if not self.math:
+            mime_type_q = 'application/vnd.nextthought.naquestion'
+            mime_type_f = 'application/vnd.nextthought.assessment.freeresponsepart'
+            mime_type_f_s = 'application/vnd.nextthought.assessment.freeresponsesolution'
 
-        if not self.path:
-            Manifest(self.title, 'textEntryInteraction')
-        else:
-            Manifest(self.title, 'textEntryInteraction', self.path)
+            nti_solutions = [{'Class': 'FreeResponseSolution', 'MimeType': mime_type_f_s,
+                              'value': value, 'weight': 1.0} for value in self.values]
 
-    def to_nti(self):
-        if not self.math:
-            values = deepcopy(self.values)
-
-            mime_type_q = '"application/vnd.nextthought.naquestion"'
-            mime_type_f = '"application/vnd.nextthought.assessment.freeresponsepart"'
-            mime_type_f_s = '"application/vnd.nextthought.assessment.freeresponsesolution"'
-
-            nti_json = '{"Class":"Question", "MimeType":' + mime_type_q + ', "NTIID":"' + \
-                       self.identifier + '", "content":"' + self.prompt + '", "ntiid":"' + \
-                       self.identifier + '", "parts":[{"Class":"FreeResponsePart", "MimeType":' + \
-                       mime_type_f + ', "content":"", "explanation":"", "hints":[], "solutions":['
-            while values:
-                if len(values) == 1:
-                    nti_json += '{"Class":"FreeResponseSolution", "MimeType":' + mime_type_f_s + \
-                                ', "value":"' + values.pop(0) + '", "weight":1.0}]}]}'
-                else:
-                    nti_json += '{"Class":"FreeResponseSolution", "MimeType":' + mime_type_f_s + \
-                                ', "value":"' + values.pop(0) + '", "weight":1.0},'
-
-            parsed = loads(nti_json)
-
-            if not self.path:
-                nti_file = open_file(self.title + '.json', 'w+', encoding="utf-8")
-            else:
-                nti_file = open_file(self.path + self.title + '.json', 'w+', encoding="utf-8")
-            nti_file.write(unicode(dumps(parsed, indent=4, sort_keys=True)))
-            nti_file.close()
+            nti_json = {'Class': 'Question', 'MimeType': mime_type_q, 'NTIID': self.identifier,
+                        'content': self.prompt, 'ntiid': self.identifier,
+                        'parts': [{'Class': 'FreeResponsePart', 'MimeType': mime_type_f,
+                                   'content': '', 'explanation': '', 'hints': [],
+                                   'solutions': nti_solutions}]}
+
+            return nti_json
 
         if self.math:
-            mime_type_q = '"application/vnd.nextthought.naquestion"'
-            mime_type_s_m = '"application/vnd.nextthought.assessment.symbolicmathpart"'
-            mime_type_s_m_s = '"application/vnd.nextthought.assessment.latexsymbolicmathsolution"'
+            mime_type_q = 'application/vnd.nextthought.naquestion'
+            mime_type_s_m = 'application/vnd.nextthought.assessment.symbolicmathpart'
+            mime_type_s_m_s = 'application/vnd.nextthought.assessment.latexsymbolicmathsolution'
 
             if compile_pattern('<a.*></a> ').match(self.prompt) is not None:
-                self.content = sub('<a.*></a> ', '', self.prompt)
-                self.prompt = compile_pattern('(<a.*></a>).*').match(self.prompt).group(1)
+                content = sub('<a.*></a> ', '', self.prompt)
+                prompt = compile_pattern('(<a.*></a>).*').match(self.prompt).group(1)
+            else:
+                content = ''
+                prompt = self.prompt
 
-            nti_json = '{"Class":"Question", "MimeType":' + mime_type_q + ', "NTIID":"' + \
-                       self.identifier + '", "content":"' + self.prompt + '", "ntiid":"' + \
-                       self.identifier + '", "parts":[{"Class":"SymbolicMathPart", "MimeType":' + \
-                       mime_type_s_m + ', "allowed_units":[""], "content":"' + self.content + \
-                       '","explanation":"", "hints":[], "solutions":[{"Class":' \
-                       '"LatexSymbolicMathSolution", "MimeType":' + mime_type_s_m_s + ', ' \
-                       '"allowed_units":[""], "value":"' + self.values + '", "weight":1.0}]}]}'
+            nti_json = {'Class': 'Question', 'MimeType': mime_type_q, 'NTIID': self.identifier,
+                        'content': prompt, 'ntiid': self.identifier,
+                        'parts': [{'Class': 'SymbolicMathPart', 'MimeType': mime_type_s_m,
+                                   'allowed_units': [''], 'content': content,
+                                   'explanation': '', 'hints': [],
+                                   'solutions': [{'Class': 'LatexSymbolicMathSolution',
+                                                  'MimeType': mime_type_s_m_s,
+                                                  'allowed_units': [''], 'value': self.values,
+                                                  'weight': 1.0}]}]}
 
-            parsed = loads(nti_json)
+            return nti_json
 
-            if not self.path:
-                nti_file = open_file(self.title + '.json', 'w+', encoding="utf-8")
-            else:
-                nti_file = open_file(self.path + self.title + '.json', 'w+', encoding="utf-8")
-            nti_file.write(unicode(dumps(parsed, indent=4, sort_keys=True)))
-            nti_file.close()
 
+class UploadInteraction(Interaction):
 
-class UploadInteraction(object):
+    __slots__ = ()
 
-    def __init__(self, identifier, prompt, title, path=''):
-        if isinstance(identifier, str):
-            self.identifier = identifier
-        else:
-            raise TypeError('identifier needs to be a str type')
+    fields = (IDENTIFIER, PROMPT, TITLE, PATH)
 
-        if isinstance(prompt, str):
-            self.prompt = prompt
-        else:
-            raise TypeError('prompt needs to be a str type')
+    interaction_type = 'uploadInteraction'
 
-        if isinstance(title, str):
-            if not title:
-                self.title = identifier
-            else:
-                self.title = title
-        else:
-            raise TypeError('title needs to be a str type')
+    def __init__(self, identifier, prompt, title, path=''):
+        super(UploadInteraction, self).__init__(identifier, prompt, title, path)
 
-        if isinstance(path, str):
-            self.path = path
-        else:
-            raise TypeError('path needs to be a str type')
-
-        if not identifier:
-            raise ValueError('identifier cannot be empty')
-
-        if not prompt:
-            raise ValueError('prompt cannot be empty')
-
-    def to_qti(self, adaptive='false', time_dependent='false'):
-        assessment_item = Element('assessmentItem',
-                                  {'xmlns': "http://www.imsglobal.org/xsd/imsqti_v2p2",
-                                   'xmlns:xsi': "http://www.w3.org/2001/XMLSchema-instance",
-                                   'xsi:schemaLocation':
-                                       "http://www.imsglobal.org/xsd/imsqti_v2p2 "
-                                       "http://www.imsglobal.org/xsd/qti/qtiv2p2/imsqti_v2p2.xsd",
-                                   'identifier': self.identifier,
-                                   'title': self.title,
-                                   'adaptive': adaptive,
-                                   'timeDependent': time_dependent})
+    def to_qti(self, adaptive='false', time_dependent='false', sink=None, compact=False,
+               timestamp=None, level=None):
+        assessment_item = self.qti_item(adaptive, time_dependent)
+        return package(self, self.interaction_type, assessment_item, sink, compact, timestamp,
+                       level)
+
+    def qti_item(self, adaptive='false', time_dependent='false'):
+        assessment_item = self.assessment_item(adaptive, time_dependent)
         # response_declaration
         SubElement(assessment_item, 'responseDeclaration', {'identifier': 'RESPONSE',
                                                             'cardinality': 'single',
                                                             'baseType': 'file'})
         # outcome_declaration
-        SubElement(assessment_item, 'outcomeDeclaration', {'identifier': 'SCORE',
-                                                           'cardinality': 'single',
-                                                           'baseType': 'float'})
+        assessment_item.append(SCORE)
         item_body = SubElement(assessment_item, 'itemBody')
         upload_interaction = SubElement(item_body, 'uploadInteraction', {'responseIdentifier':
                                                                          'RESPONSE'})
         prompt__sub_element = SubElement(upload_interaction, 'prompt')
         prompt__sub_element.text = self.prompt
 
-        rough_string = tostring(assessment_item)
-        reparsed = parseString(rough_string)
+        return assessment_item
 
-        if not self.path:
-            qti_file = open_file(self.title + '.xml', 'w+', encoding="utf-8")
-        else:
-            qti_file = open_file(self.path + self.title + '.xml', 'w+', encoding="utf-8")
-        qti_file.write(reparsed.toprettyxml(indent="  "))
-        qti_file.close()
+    def nti_question(self):
+        mime_type_q = 'application/vnd.nextthought.naquestion'
+        mime_type_f = 'application/vnd.nextthought.assessment.filepart'
 
-        if not self.path:
-            Manifest(self.title, 'uploadInteraction')
-        else:
-            Manifest(self.title, 'uploadInteraction', self.path)
+        nti_json = {'Class': 'Question', 'MimeType': mime_type_q, 'NTIID': self.identifier,
+                    'content': self.prompt, 'ntiid': self.identifier,
+                    'parts': [{'Class': 'FilePart', 'MimeType': mime_type_f,
+                               'allowed_extensions': ['.docx', '.pdf'],
+                               'allowed_mime_types': ['*/*'], 'content': '', 'explanation': '',
+                               'hints': [], 'max_file_size': 10485760, 'solutions': []}]}
+
+        return nti_json
+
+
+def package(interaction, interaction_type, assessment_item, sink=None, compact=False,
+            timestamp=None, level=None):
+    """Zips a QTI item with its manifest and returns the name of the package.
+
+    The package is written to the interaction's path, or, when a sink (anything with a writestr
+    method, such as a ZipFile) is given, built in memory and written to the sink.
+    When compact, neither the item nor the manifest is indented. With a timestamp, the package
+    is deterministic, and with a level, it is deflated (see Manifest).
+    """
+    if sink is not None:
+        return Manifest(interaction.title, interaction_type, interaction.path,
+                        qti=to_xml(assessment_item, compact=compact), sink=sink,
+                        compact=compact, timestamp=timestamp, level=level).package
+
+    qti_file = open_file(interaction.path + interaction.title + '.xml', 'wb')
+    write_xml(assessment_item, qti_file, compact=compact)
+    qti_file.close()
+
+    return Manifest(interaction.title, interaction_type, interaction.path,
+                    compact=compact, timestamp=timestamp, level=level).package
+
+
+def to_identifier(index):
+    """Returns the letter identifier of a zero-based index: A to Z, then AA, AB and so on."""
+    if not isinstance(index, (int, long)):
+        raise TypeError('index needs to be an int type')
+
+    if index < 0:
+        raise ValueError('index cannot be negative')
 
-    def to_nti(self):
-        mime_type_q = '"application/vnd.nextthought.naquestion"'
-        mime_type_f = '"application/vnd.nextthought.assessment.filepart"'
+    identifier = ''
+    index += 1
+    while index:
+        index, letter = divmod(index - 1, 26)
+        identifier = ascii_uppercase[letter] + identifier
+    return identifier
 
-        nti_json = '{"Class":"Question", "MimeType":' + mime_type_q + ', "NTIID":"' + \
-                   self.identifier + '", "content":"' + self.prompt + '", "ntiid":"' + \
-                   self.identifier + '", "parts":[{"Class":"FilePart", "MimeType":' + \
-                   mime_type_f + ', "allowed_extensions":[".docx", ".pdf"], ' \
-                   '"allowed_mime_types":["*/*"], "content":"", "explanation":"", "hints":[], ' \
-                   '"max_file_size":10485760, "solutions":[]}]}'
 
-        parsed = loads(nti_json)
+def from_identifier(identifier):
+    """Returns the zero-based index of a letter identifier made by to_identifier()."""
+    if not isinstance(identifier, str):
+        raise TypeError('identifier needs to be a str type')
+
+    if not identifier or not identifier.isalpha() or not identifier.isupper():
+        raise ValueError('identifier must be made of the letters A to Z')
+
+    index = 0
+    for letter in identifier:
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def json_bytes(nti_json, compact=False):
+    """Returns an NTI question as JSON, indented unless compact."""
+    return encode(nti_json, compact)
+
+
+def write_json(interaction, nti_json, compact=False):
+    """Writes an NTI question to the interaction's path, indented unless compact."""
+    nti_file = open_file(interaction.path + interaction.title + '.json', 'wb')
+    nti_file.write(json_bytes(nti_json, compact))
+    nti_file.close()
+
+
+class Word(object):
+
+    __slots__ = ('content', 'wid')
+
+    def __init__(self, content, wid):
+        if isinstance(content, str):
+            self.content = content
+        else:
+            raise TypeError('content needs to be a str type')
 
-        if not self.path:
-            nti_file = open_file(self.title + '.json', 'w+', encoding="utf-8")
+        if isinstance(wid, str):
+            self.wid = wid
         else:
-            nti_file = open_file(self.path + self.title + '.json', 'w+', encoding="utf-8")
-        nti_file.write(unicode(dumps(parsed, indent=4, sort_keys=True)))
-        nti_file.close()
+            raise TypeError('wid needs to be a str type')
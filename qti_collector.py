@@ -1,4 +1,3 @@
-from re import compile as compile_pattern
 from re import sub
 
 from xml.etree.ElementTree import parse
@@ -13,7 +12,7 @@ from parsers import UploadInteraction
 
 class QTICollector(object):
 
-    def __init__(self, file_name, path=''):
+    def __init__(self, file_name, path='', compact=False, sink=None):
         if isinstance(file_name, str):
             self.file_name = file_name
         else:
@@ -24,6 +23,16 @@ class QTICollector(object):
         else:
             raise TypeError('path needs to be a str type')
 
+        if isinstance(compact, bool):
+            self.compact = compact
+        else:
+            raise TypeError('compact needs to be a bool type')
+
+        if sink is None or hasattr(sink, 'writestr'):
+            self.sink = sink
+        else:
+            raise TypeError('sink needs to have a writestr method')
+
         if not file_name.lower().endswith('.xml'):
             raise TypeError('file_name must be a .xml file')
 
@@ -75,7 +84,7 @@ class QTICollector(object):
 
             choice_output = ChoiceInteraction(self.identifier, self.prompt, self.title, self.values,
                                               self.choices, self.path)
-            choice_output.to_nti()
+            choice_output.to_nti(self.compact, self.sink)
 
         elif self.root.find(self.name_space + 'itemBody').\
                 find(self.name_space + 'extendedTextInteraction') is not None:
@@ -86,7 +95,7 @@ class QTICollector(object):
 
             extended_output = ExtendedTextInteraction(self.identifier, self.prompt, self.title,
                                                       self.path)
-            extended_output.to_nti()
+            extended_output.to_nti(self.compact, self.sink)
 
         elif self.root.find(self.name_space + 'itemBody').\
                 find(self.name_space + 'matchInteraction') is not None:
@@ -142,7 +151,7 @@ class QTICollector(object):
 
             match_output = MatchInteraction(self.identifier, self.prompt, self.title, self.labels,
                                             self.solutions, self.values, self.path)
-            match_output.to_nti()
+            match_output.to_nti(self.compact, self.sink)
 
         elif self.root.find(self.name_space + 'itemBody').find(self.name_space + 'p') is not None:
             if self.root.find(self.name_space + 'itemBody').find(self.name_space + 'p').\
@@ -169,7 +178,7 @@ class QTICollector(object):
                 text_interaction = prompt.find(self.name_space + 'textEntryInteraction')
                 length = int(text_interaction.attrib['expectedLength'])
 
-                if compile_pattern(r'\n\s{6}').match(prompt.text) is not None and self.values:
+                if prompt.text and self.values:
                     self.prompt = sub(r'\n\s{6}', '', prompt.text) + '_' * length + '.'
                 else:
                     self.prompt = sub(r'\n\s{6}', '', prompt.text)
@@ -177,11 +186,11 @@ class QTICollector(object):
                 if self.values:
                     text_output = TextEntryInteraction(self.identifier, self.prompt, self.title,
                                                        self.values, False, self.path)
-                    text_output.to_nti()
+                    text_output.to_nti(self.compact, self.sink)
                 else:
                     math_output = TextEntryInteraction(self.identifier, self.prompt, self.title,
                                                        self.value_single, True, self.path)
-                    math_output.to_nti()
+                    math_output.to_nti(self.compact, self.sink)
 
             elif self.root.find(self.name_space + 'itemBody').find(self.name_space + 'p').\
                     find(self.name_space + 'inlineChoiceInteraction') is not None:
@@ -221,14 +230,14 @@ class QTICollector(object):
 
                 temp = self.prompt.pop(0)
                 for label in self.labels:
-                    temp = temp + '<input type=\\"blankfield\\" name=\\"' + label + '\\" />'
+                    temp = temp + '<input type="blankfield" name="' + label + '" />'
                     temp = temp + self.prompt.pop(0)
                 self.prompt = temp
 
                 inline_output = InlineChoiceInteraction(self.identifier, self.prompt, self.title,
                                                         self.labels, self.solutions, self.wordbank,
                                                         False, self.path)
-                inline_output.to_nti()
+                inline_output.to_nti(self.compact, self.sink)
 
         elif self.root.find(self.name_space + 'itemBody').\
                 find(self.name_space + 'uploadInteraction') is not None:
@@ -238,7 +247,7 @@ class QTICollector(object):
             self.prompt = prompt.text
 
             upload_output = UploadInteraction(self.identifier, self.prompt, self.title, self.path)
-            upload_output.to_nti()
+            upload_output.to_nti(self.compact, self.sink)
 
         else:
             raise NotImplementedError('there is no valid question type to convert')
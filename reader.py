@@ -0,0 +1,330 @@
+from json.decoder import scanstring
+
+from mmap import mmap
+
+from re import compile as compile_pattern
+
+
+WHITESPACE = compile_pattern(r'[ \t\n\r]*')
+STRING_END = compile_pattern(r'[^"\\]*(?:\\.[^"\\]*)*"')
+STRUCTURE = compile_pattern(r'[{}\[\]"]')
+NUMBER_CHARS = compile_pattern(r'[-+.0-9eE]*')
+NUMBER = compile_pattern(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?')
+
+LITERALS = {'t': ('true', 'boolean', True),
+            'f': ('false', 'boolean', False),
+            'n': ('null', 'null', None)}
+
+
+class Scanner(object):
+    """Holds the part of a JSON document being scanned, reading it from a stream in chunks.
+
+    buffer holds the document from offset on, and pos is the position in buffer the scanner is
+    at. A memory-mapped document is the buffer itself, so it is never read in chunks.
+
+    :param stream: A file-like object opened in binary mode or an mmap holding the JSON document.
+    :param int chunk_size: The number of bytes read from the stream at a time.
+    """
+
+    def __init__(self, stream, chunk_size=65536):
+        if hasattr(stream, 'read'):
+            self.stream = stream
+        else:
+            raise TypeError('stream needs to be a file-like object')
+
+        if isinstance(chunk_size, int):
+            self.chunk_size = chunk_size
+        else:
+            raise TypeError('chunk_size needs to be an int type')
+
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be greater than 0')
+
+        if isinstance(stream, mmap):
+            self.buffer = stream
+            self.eof = True
+        else:
+            self.buffer = ''
+            self.eof = False
+        self.pos = 0
+        self.offset = 0
+
+    def read(self):
+        """Appends the next chunk of the stream to the buffer, dropping what is before pos.
+
+        Returns False once the stream has been read to its end.
+        """
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.offset += self.pos
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def position(self):
+        return 'offset ' + str(self.offset + self.pos)
+
+
+class EventReader(Scanner):
+    """Reads a JSON document incrementally and yields (event, value) pairs.
+
+    The events are start_map, map_key, end_map, start_array, end_array, string, number, boolean
+    and null. Only chunk_size characters of the input (plus the token being read) are held in
+    memory, so neither the size nor the layout (pretty-printed or minified) of the document matter.
+    A memory-mapped document is searched in place instead of being read in chunks.
+
+    :param stream: A file-like or mmap object holding the JSON document.
+    :param int chunk_size: The number of characters read from the stream at a time.
+    """
+
+    def __init__(self, stream, chunk_size=65536):
+        super(EventReader, self).__init__(stream, chunk_size)
+
+        # '{' or '[' for every open container, innermost last
+        self.stack = []
+        # the next token: 'value', 'first_value', 'key', 'first_key', 'colon', 'comma' or 'done'
+        self.expect = 'value'
+
+    def __iter__(self):
+        return self
+
+    @property
+    def depth(self):
+        return len(self.stack)
+
+    def next(self):
+        while True:
+            char = self.peek()
+
+            if not char:
+                if self.expect != 'done':
+                    raise ValueError('unexpected end of JSON input')
+                raise StopIteration
+
+            if self.expect == 'done':
+                raise ValueError('extra data after JSON document at ' + self.position())
+
+            if self.expect == 'colon':
+                if char != ':':
+                    raise ValueError('expected ":" at ' + self.position())
+                self.pos += 1
+                self.expect = 'value'
+
+            elif self.expect == 'comma':
+                if char != ',':
+                    return self.close(char)
+                self.pos += 1
+                self.expect = 'key' if self.stack[-1] == '{' else 'value'
+
+            elif self.expect in ('key', 'first_key'):
+                if char == '}' and self.expect == 'first_key':
+                    return self.close(char)
+                if char != '"':
+                    raise ValueError('expected a key at ' + self.position())
+                self.expect = 'colon'
+                return 'map_key', self.string()
+
+            elif char == ']' and self.expect == 'first_value':
+                return self.close(char)
+
+            else:
+                return self.value(char)
+
+    __next__ = next
+
+    def skip(self):
+        """Consumes the rest of the innermost open container, including its closing event.
+
+        Only brackets are counted (strings are stepped over whole), so nothing inside the
+        container is tokenized or decoded, and its contents are not validated either.
+        """
+        if not self.stack:
+            raise ValueError('there is no open container to skip')
+
+        depth = 1
+        while depth:
+            matcher = STRUCTURE.search(self.buffer, self.pos)
+            if matcher is None:
+                self.pos = len(self.buffer)
+                if not self.read():
+                    raise ValueError('unexpected end of JSON input')
+                continue
+            self.pos = matcher.end()
+            char = matcher.group()
+
+            if char == '"':
+                end = STRING_END.match(self.buffer, self.pos)
+                while end is None:
+                    if not self.read():
+                        raise ValueError('unterminated string at ' + self.position())
+                    end = STRING_END.match(self.buffer, self.pos)
+                self.pos = end.end()
+            elif char == '{' or char == '[':
+                depth += 1
+            else:
+                depth -= 1
+
+        self.stack.pop()
+        self.expect = 'comma' if self.stack else 'done'
+
+    def value(self, char):
+        if char == '{':
+            self.pos += 1
+            self.stack.append('{')
+            self.expect = 'first_key'
+            return 'start_map', None
+
+        if char == '[':
+            self.pos += 1
+            self.stack.append('[')
+            self.expect = 'first_value'
+            return 'start_array', None
+
+        if char == '"':
+            event = 'string', self.string()
+        elif char == '-' or char.isdigit():
+            event = 'number', self.number()
+        elif char in LITERALS:
+            literal, name, value = LITERALS[char]
+            if not self.fill(len(literal)) or \
+                    self.buffer[self.pos:self.pos + len(literal)] != literal:
+                raise ValueError('invalid literal at ' + self.position())
+            self.pos += len(literal)
+            event = name, value
+        else:
+            raise ValueError('unexpected character ' + repr(char) + ' at ' + self.position())
+
+        self.expect = 'comma' if self.stack else 'done'
+        return event
+
+    def close(self, char):
+        if not self.stack or char != {'{': '}', '[': ']'}[self.stack[-1]]:
+            raise ValueError('unexpected character ' + repr(char) + ' at ' + self.position())
+        self.pos += 1
+        self.stack.pop()
+        self.expect = 'comma' if self.stack else 'done'
+        return ('end_map', None) if char == '}' else ('end_array', None)
+
+    def string(self):
+        end = STRING_END.match(self.buffer, self.pos + 1)
+        while end is None:
+            if not self.read():
+                raise ValueError('unterminated string at ' + self.position())
+            end = STRING_END.match(self.buffer, self.pos + 1)
+        # only the string itself is copied out of a memory-mapped buffer
+        value = scanstring(self.buffer[self.pos:end.end()], 1)[0]
+        self.pos = end.end()
+        return value
+
+    def number(self):
+        while NUMBER_CHARS.match(self.buffer, self.pos).end() == len(self.buffer):
+            if not self.read():
+                break
+        matcher = NUMBER.match(self.buffer, self.pos)
+        if matcher is None or matcher.end() != NUMBER_CHARS.match(self.buffer, self.pos).end():
+            raise ValueError('invalid number at ' + self.position())
+        self.pos = matcher.end()
+        number = matcher.group()
+        if '.' in number or 'e' in number or 'E' in number:
+            return float(number)
+        return int(number)
+
+    def peek(self):
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.read():
+                return ''
+
+    def fill(self, size):
+        while len(self.buffer) - self.pos < size:
+            if not self.read():
+                return False
+        return True
+
+
+CLASS_VALUE = compile_pattern(r'[ \t\n\r]*:[ \t\n\r]*"([^"\\]*)"')
+
+
+class QuestionSpans(Scanner):
+    """Yields the (start, end) byte offsets of every Question object in a JSON document.
+
+    Only brackets and strings are looked at and no value is decoded, which makes this much
+    cheaper than reading the events of the document. Questions inside Poll objects are ignored.
+    A memory-mapped document is searched in place, without copying it into Python strings.
+
+    :param stream: A file-like object opened in binary mode or an mmap holding the JSON document.
+    :param int chunk_size: The number of bytes read from the stream at a time.
+    """
+
+    def __iter__(self):
+        # [start offset, is_question, is_poll] for every open map, None for every open array
+        stack = []
+        polls = 0
+
+        while True:
+            matcher = STRUCTURE.search(self.buffer, self.pos)
+            if matcher is None:
+                self.pos = len(self.buffer)
+                if self.read():
+                    continue
+                break
+            self.pos = matcher.end()
+            char = matcher.group()
+
+            if char == '"':
+                value = self.class_value()
+                if value is not None and stack and stack[-1] is not None:
+                    if value == 'Question' and not polls:
+                        stack[-1][1] = True
+                    elif value == 'Poll' and not stack[-1][2]:
+                        stack[-1][2] = True
+                        polls += 1
+
+            elif char == '{':
+                stack.append([self.offset + matcher.start(), False, False])
+
+            elif char == '[':
+                stack.append(None)
+
+            elif not stack:
+                raise ValueError('unexpected ' + repr(char) + ' at offset ' +
+                                 str(self.offset + matcher.start()))
+
+            else:
+                frame = stack.pop()
+                if frame is not None:
+                    if frame[2]:
+                        polls -= 1
+                    if frame[1]:
+                        yield frame[0], self.offset + self.pos
+
+    def class_value(self):
+        """Skips the string starting at pos and returns the value it holds if it is a Class key."""
+        end = STRING_END.match(self.buffer, self.pos)
+        while end is None:
+            if not self.read():
+                raise ValueError('unterminated string at ' + self.position())
+            end = STRING_END.match(self.buffer, self.pos)
+
+        # the length is compared first so that other strings are never copied out of the buffer
+        if end.end() - 1 - self.pos != 5 or self.buffer[self.pos:end.end() - 1] != 'Class':
+            self.pos = end.end()
+            return None
+
+        value = CLASS_VALUE.match(self.buffer, end.end())
+        # a Class value is short, so it is only missing if the buffer ends right after the key
+        while value is None and len(self.buffer) - end.end() < 256 and self.read():
+            end = STRING_END.match(self.buffer, self.pos)
+            value = CLASS_VALUE.match(self.buffer, end.end())
+
+        if value is None:
+            self.pos = end.end()
+            return None
+        self.pos = value.end()
+        return value.group(1)
@@ -0,0 +1,350 @@
+from binascii import crc32
+
+from calendar import timegm
+
+from collections import deque
+
+from cStringIO import StringIO
+
+from datetime import datetime
+
+from gzip import GzipFile
+
+from multiprocessing.pool import ThreadPool
+
+from os import makedirs
+
+from os.path import dirname
+from os.path import getsize
+from os.path import isdir
+from os.path import join
+
+from shutil import copyfile
+
+from tarfile import TarInfo
+from tarfile import open as open_tar
+
+from time import time
+
+from zipfile import ZIP64_LIMIT
+from zipfile import ZIP_DEFLATED
+from zipfile import ZIP_STORED
+from zipfile import ZipFile
+from zipfile import ZipInfo
+
+from zlib import DEFLATED
+from zlib import compressobj
+
+
+# the endings of members that are compressed already
+ARCHIVES = ('.zip', '.gz', '.tgz', '.bz2', '.xz', '.png', '.jpg', '.jpeg')
+
+# the size of the chunks a file is copied into a zip file in
+CHUNK_SIZE = 64 * 1024
+
+
+class Sink(object):
+    """Where converted items and packages are written to.
+
+    A sink has the writestr(name, data), write(file_name, name) and close() methods of a
+    ZipFile, so a ZipFile can be used wherever a sink is expected.
+    """
+
+    def writestr(self, name, data):
+        raise NotImplementedError
+
+    def write(self, file_name, name):
+        """Writes a file as the member name. Sinks that can copy it in chunks do so."""
+        in_file = open(file_name, 'rb')
+        data = in_file.read()
+        in_file.close()
+        self.writestr(name, data)
+
+    def close(self):
+        pass
+
+
+class DirectorySink(Sink):
+    """Writes every member as a file below a directory, which is created when it is missing."""
+
+    def __init__(self, path):
+        if isinstance(path, str):
+            self.path = path
+        else:
+            raise TypeError('path needs to be a str type')
+
+    def writestr(self, name, data):
+        file_name = join(self.path, name)
+        directory = dirname(file_name)
+        if directory and not isdir(directory):
+            makedirs(directory)
+        out_file = open(file_name, 'wb')
+        out_file.write(data)
+        out_file.close()
+
+    def write(self, file_name, name):
+        out_name = join(self.path, name)
+        directory = dirname(out_name)
+        if directory and not isdir(directory):
+            makedirs(directory)
+        copyfile(file_name, out_name)
+
+
+class ZipSink(Sink):
+    """Writes every member into a zip file, dated timestamp instead of now when it is given.
+
+    With ZIP_DEFLATED compression, the members are deflated at level (the zlib default when it
+    is None), except for archives and images, which are stored as they are unless
+    store_archives is False. With workers > 1, members are deflated in that many threads while
+    the ones before them are written, in order.
+
+    :param str file_name: The zip file to write.
+    :param int compression: ZIP_STORED or ZIP_DEFLATED.
+    :param timestamp: A datetime to date every member with instead of now.
+    :param int level: The zlib level, from 0 (fastest) to 9 (smallest).
+    :param bool store_archives: Whether to store members that are compressed already.
+    :param int workers: The number of threads deflating members.
+    """
+
+    def __init__(self, file_name, compression=ZIP_STORED, timestamp=None, level=None,
+                 store_archives=True, workers=1):
+        if compression not in (ZIP_STORED, ZIP_DEFLATED):
+            raise ValueError('compression must be ZIP_STORED or ZIP_DEFLATED')
+
+        if timestamp is None or isinstance(timestamp, datetime):
+            self.timestamp = timestamp
+        else:
+            raise TypeError('timestamp needs to be a datetime type')
+
+        if level is None:
+            self.level = -1
+        else:
+            self.level = check_level(level)
+
+        if isinstance(store_archives, bool):
+            self.store_archives = store_archives
+        else:
+            raise TypeError('store_archives needs to be a bool type')
+
+        if not isinstance(workers, int):
+            raise TypeError('workers needs to be an int type')
+
+        if workers < 1:
+            raise ValueError('workers must be greater than 0')
+
+        self.compression = compression
+        self.workers = workers
+        self.pool = ThreadPool(workers) if workers > 1 and compression == ZIP_DEFLATED else None
+        # (name, data, deflated data to come) of the members being deflated, in order
+        self.pending = deque()
+        # members are stored unless they are deflated here, so that the level applies, and ZIP64
+        # lets an export hold 65,535 members or more
+        self.zip_file = ZipFile(file_name, 'w', ZIP_STORED, allowZip64=True)
+
+    def writestr(self, name, data):
+        if self.compression == ZIP_STORED or \
+                (self.store_archives and name.lower().endswith(ARCHIVES)):
+            self.flush()
+            write_member(self.zip_file, name, data, self.timestamp)
+        elif self.pool is None:
+            write_member(self.zip_file, name, data, self.timestamp, deflate(data, self.level))
+        else:
+            # zlib lets go of the GIL, so the threads deflate at the same time
+            self.pending.append((name, data, self.pool.apply_async(deflate, (data, self.level))))
+            self.flush(2 * self.workers)
+
+    def write(self, file_name, name):
+        self.flush()
+        if self.compression == ZIP_STORED or \
+                (self.store_archives and name.lower().endswith(ARCHIVES)):
+            write_file(self.zip_file, name, file_name, self.timestamp)
+        else:
+            write_file(self.zip_file, name, file_name, self.timestamp, self.level)
+
+    def flush(self, keep=0):
+        """Writes the deflated members in order, until at most keep are still pending."""
+        while len(self.pending) > keep:
+            name, data, deflated = self.pending.popleft()
+            write_member(self.zip_file, name, data, self.timestamp, deflated.get())
+
+    def close(self):
+        self.flush()
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+        self.zip_file.close()
+
+
+class TarSink(Sink):
+    """Writes every member into a tar file, compressed if the mode asks for it (e.g. 'w:gz').
+
+    When a timestamp is given, the members (and the header of a gzip file) are dated timestamp
+    instead of now.
+    """
+
+    def __init__(self, file_name, mode='w', timestamp=None):
+        if not isinstance(mode, str):
+            raise TypeError('mode needs to be a str type')
+
+        if not mode.startswith('w'):
+            raise ValueError('mode must be a write mode')
+
+        if timestamp is None:
+            self.mtime = None
+        elif isinstance(timestamp, datetime):
+            self.mtime = timegm(timestamp.timetuple())
+        else:
+            raise TypeError('timestamp needs to be a datetime type')
+
+        self.gzip_file = None
+        if self.mtime is not None and mode == 'w:gz':
+            # tarfile would put the time and the file name in the gzip header
+            self.out_file = open(file_name, 'wb')
+            self.gzip_file = GzipFile('', 'wb', fileobj=self.out_file, mtime=self.mtime)
+            self.tar_file = open_tar(fileobj=self.gzip_file, mode='w')
+        else:
+            self.tar_file = open_tar(file_name, mode)
+
+    def writestr(self, name, data):
+        info = TarInfo(name)
+        info.size = len(data)
+        info.mtime = time() if self.mtime is None else self.mtime
+        self.tar_file.addfile(info, StringIO(data))
+
+    def write(self, file_name, name):
+        info = TarInfo(name)
+        info.size = getsize(file_name)
+        info.mtime = time() if self.mtime is None else self.mtime
+        in_file = open(file_name, 'rb')
+        self.tar_file.addfile(info, in_file)
+        in_file.close()
+
+    def close(self):
+        self.tar_file.close()
+        if self.gzip_file is not None:
+            self.gzip_file.close()
+            self.out_file.close()
+
+
+class MemorySink(Sink):
+    """Keeps every member as a (name, data) pair in members."""
+
+    def __init__(self):
+        self.members = []
+
+    def writestr(self, name, data):
+        self.members.append((name, data))
+
+
+class NullSink(Sink):
+    """Discards every member, only counting them, to measure a conversion without any I/O."""
+
+    def __init__(self):
+        self.count = 0
+        self.size = 0
+
+    def writestr(self, name, data):
+        self.count += 1
+        self.size += len(data)
+
+    def write(self, file_name, name):
+        self.count += 1
+        self.size += getsize(file_name)
+
+
+def write_member(zip_file, name, data, timestamp=None, deflated=None):
+    """Writes data to a zip file, dated timestamp instead of now when it is given.
+
+    The data is compressed the way the zip file compresses its members, unless it is given
+    deflated already (by deflate()), in which case that is written as it is.
+    """
+    if timestamp is None and deflated is None:
+        zip_file.writestr(name, data)
+        return
+
+    info = ZipInfo(name, (datetime.now() if timestamp is None else timestamp).timetuple()[:6])
+    info.compress_type = zip_file.compression
+    # the permissions writestr gives a member it names itself
+    info.external_attr = 0600 << 16
+    if deflated is None:
+        zip_file.writestr(info, data)
+        return
+
+    # what writestr does, minus the deflating, as ZipFile cannot take a deflated member
+    info.compress_type = ZIP_DEFLATED
+    info.file_size = len(data)
+    info.compress_size = len(deflated)
+    info.CRC = crc32(data) & 0xffffffff
+    info.header_offset = zip_file.fp.tell()
+    zip_file._writecheck(info)
+    zip_file._didModify = True
+    zip_file.fp.write(info.FileHeader(info.file_size > ZIP64_LIMIT or
+                                      info.compress_size > ZIP64_LIMIT))
+    zip_file.fp.write(deflated)
+    zip_file.fp.flush()
+    zip_file.filelist.append(info)
+    zip_file.NameToInfo[info.filename] = info
+
+
+def write_file(zip_file, name, file_name, timestamp=None, level=None):
+    """Copies a file into a zip file in chunks, so that it never has to fit in memory.
+
+    The member is dated timestamp instead of now when it is given. It is deflated at level when
+    that is given, and compressed the way the zip file compresses its members otherwise.
+    """
+    info = ZipInfo(name, (datetime.now() if timestamp is None else timestamp).timetuple()[:6])
+    info.compress_type = zip_file.compression if level is None else ZIP_DEFLATED
+    info.external_attr = 0600 << 16
+    info.file_size = getsize(file_name)
+    info.compress_size = info.CRC = 0
+    info.header_offset = zip_file.fp.tell()
+    zip_file._writecheck(info)
+    zip_file._didModify = True
+
+    if info.compress_type == ZIP_DEFLATED:
+        compressor = compressobj(-1 if level is None else level, DEFLATED, -15)
+    else:
+        compressor = None
+    # what ZipFile.write does: the header is written again once the sizes and CRC are known
+    zip64 = info.file_size * 1.05 > ZIP64_LIMIT
+    zip_file.fp.write(info.FileHeader(zip64))
+    crc = 0
+    in_file = open(file_name, 'rb')
+    chunk = in_file.read(CHUNK_SIZE)
+    while chunk:
+        crc = crc32(chunk, crc)
+        if compressor is not None:
+            chunk = compressor.compress(chunk)
+        info.compress_size += len(chunk)
+        zip_file.fp.write(chunk)
+        chunk = in_file.read(CHUNK_SIZE)
+    in_file.close()
+    if compressor is not None:
+        chunk = compressor.flush()
+        info.compress_size += len(chunk)
+        zip_file.fp.write(chunk)
+    info.CRC = crc & 0xffffffff
+
+    position = zip_file.fp.tell()
+    zip_file.fp.seek(info.header_offset)
+    zip_file.fp.write(info.FileHeader(zip64))
+    zip_file.fp.seek(position)
+    zip_file.filelist.append(info)
+    zip_file.NameToInfo[info.filename] = info
+
+
+def deflate(data, level=-1):
+    """Returns data deflated at a zlib level, the way a zip file holds it."""
+    compressor = compressobj(level, DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
+
+def check_level(level):
+    """Returns a zlib level if it is valid, and raises a TypeError or ValueError otherwise."""
+    if not isinstance(level, int):
+        raise TypeError('level needs to be an int type')
+
+    if not 0 <= level <= 9:
+        raise ValueError('level must be between 0 and 9')
+
+    return level
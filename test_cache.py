@@ -0,0 +1,55 @@
+from shutil import rmtree
+
+from tempfile import mkdtemp
+
+from unittest import TestCase
+from unittest import main
+
+from cache import PackageCache
+
+from parsers import ChoiceInteraction
+from parsers import TextEntryInteraction
+
+
+class TestPackageCache(TestCase):
+
+    def setUp(self):
+        self.path = mkdtemp()
+        self.cache = PackageCache(self.path)
+
+    def tearDown(self):
+        rmtree(self.path)
+
+    def test_text_answer_changes_key(self):
+        first = TextEntryInteraction('q', 'The answer is ____.', 'title', ['answer1'])
+        second = TextEntryInteraction('q', 'The answer is ____.', 'title', ['answer2'])
+        self.assertNotEqual(self.cache.key(first), self.cache.key(second))
+
+    def test_math_answer_changes_key(self):
+        first = TextEntryInteraction('q', 'Compute x+1', 'title', 'x^2', True)
+        second = TextEntryInteraction('q', 'Compute x+1', 'title', 'x^3', True)
+        self.assertNotEqual(self.cache.key(first), self.cache.key(second))
+
+    def test_choice_answer_changes_key(self):
+        first = ChoiceInteraction('q', 'Pick one', 'title', ['A'], ['a', 'b'])
+        second = ChoiceInteraction('q', 'Pick one', 'title', ['B'], ['a', 'b'])
+        self.assertNotEqual(self.cache.key(first), self.cache.key(second))
+
+    def test_path_does_not_change_key(self):
+        first = TextEntryInteraction('q', 'The answer is ____.', 'title', ['yes'], path='a/')
+        second = TextEntryInteraction('q', 'The answer is ____.', 'title', ['yes'], path='b/')
+        self.assertEqual(self.cache.key(first), self.cache.key(second))
+
+    def test_options_change_key(self):
+        question = TextEntryInteraction('q', 'The answer is ____.', 'title', ['yes'])
+        self.assertNotEqual(self.cache.key(question, False), self.cache.key(question, True))
+
+    def test_put_then_get(self):
+        key = self.cache.key(TextEntryInteraction('q', 'The answer is ____.', 'title', ['yes']))
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, 'item')
+        self.assertEqual(self.cache.get(key), 'item')
+
+
+if __name__ == '__main__':
+    main()
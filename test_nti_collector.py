@@ -0,0 +1,80 @@
+from os.path import join
+
+from shutil import rmtree
+
+from tempfile import mkdtemp
+
+from unittest import TestCase
+from unittest import main
+
+from nti_collector import NTICollector
+
+from sinks import MemorySink
+
+
+# a question with text outside ASCII, written with \u escapes and as raw UTF-8
+ESCAPED = '{"Items": {"q": {"Class": "Question", ' \
+          '"NTIID": "tag:nextthought.com,2011-10:OU-NAQ-X_Course.naq.qid.fr0", ' \
+          '"content": "Caf\\u00e9 \\u201cquote\\u201d ____.", ' \
+          '"parts": [{"Class": "FreeResponsePart", "content": "", ' \
+          '"solutions": [{"Class": "FreeResponseSolution", "value": "na\\u00efve", ' \
+          '"weight": 1.0}]}]}}}'
+RAW = ESCAPED.replace('\\u00e9', '\xc3\xa9').replace('\\u201c', '\xe2\x80\x9c') \
+    .replace('\\u201d', '\xe2\x80\x9d').replace('\\u00ef', '\xc3\xaf')
+
+
+# a question with a choice and a free response part, listed twice
+PARTS = '{"Class": "Question", ' \
+        '"NTIID": "tag:nextthought.com,2011-10:OU-NAQ-X_Course.naq.qid.mp0", ' \
+        '"content": "Two parts", "parts": [{"Class": "MultipleChoicePart", "content": "", ' \
+        '"choices": ["<a name=\\"c0\\"></a> <p class=\\"par\\" id=\\"p0\\">Yes</p>"], ' \
+        '"solutions": [{"Class": "MultipleChoiceSolution", "value": 0}]}, ' \
+        '{"Class": "FreeResponsePart", "content": "", ' \
+        '"solutions": [{"Class": "FreeResponseSolution", "value": "yes"}]}]}'
+MULTIPART = '{"Items": {"a": ' + PARTS + ', "b": ' + PARTS + '}}'
+
+
+class TestNTICollector(TestCase):
+
+    def setUp(self):
+        self.path = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.path)
+
+    def items(self, source, class_type=''):
+        """Returns the names of the QTI items converted from an NTI export, and the items."""
+        json_file = open(join(self.path, 'sample.json'), 'wb')
+        json_file.write(source)
+        json_file.close()
+        sink = MemorySink()
+        NTICollector('sample.json', join(self.path, 'sample') + '/', class_type, in_memory=True,
+                     single_package=True, sink=sink)
+        return [name for name, _ in sink.members], dict(sink.members)
+
+    def item(self, source):
+        """Returns the QTI item converted from an NTI export."""
+        return self.items(source)[1]['Course.fr0.xml']
+
+    def test_escaped_text_is_utf8(self):
+        item = self.item(ESCAPED)
+        self.assertIn('Caf\xc3\xa9 \xe2\x80\x9cquote\xe2\x80\x9d', item)
+        self.assertIn('<value>na\xc3\xafve</value>', item)
+        self.assertNotIn('\\u', item)
+
+    def test_raw_text_is_utf8(self):
+        self.assertEqual(self.item(RAW), self.item(ESCAPED))
+
+    def test_every_part_is_converted_once(self):
+        names, items = self.items(MULTIPART)
+        self.assertEqual(names, ['Course.mp0.xml', 'Course.mp0.part1.xml', 'imsmanifest.xml'])
+        self.assertIn('choiceInteraction', items['Course.mp0.xml'])
+        self.assertIn('textEntryInteraction', items['Course.mp0.part1.xml'])
+
+    def test_filtered_parts_keep_their_title(self):
+        names, _ = self.items(MULTIPART, 'TextEntryInteraction')
+        self.assertEqual(names, ['Course.mp0.part1.xml', 'imsmanifest.xml'])
+
+
+if __name__ == '__main__':
+    main()
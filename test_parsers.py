@@ -0,0 +1,70 @@
+from time import time
+
+from unittest import TestCase
+from unittest import main
+
+from parsers import ChoiceInteraction
+from parsers import InlineChoiceInteraction
+from parsers import MatchInteraction
+from parsers import Word
+
+
+# the sizes an item is converted at, and the growth of the time allowed between them: 4 times the
+# items should take about 4 times as long, and would take 16 times as long if it were quadratic
+SMALL = 2500
+LARGE = 10000
+GROWTH = 8
+
+
+def choice(size):
+    return ChoiceInteraction('choice', 'Pick them', 'title', [str(index) for index in range(size)],
+                             ['choice %d' % index for index in range(size)])
+
+
+def match(size):
+    return MatchInteraction('match', 'Match them', 'title',
+                            ['label %d' % index for index in range(size)],
+                            ['%d %d' % (index, size - 1 - index) for index in range(size)],
+                            ['value %d' % index for index in range(size)])
+
+
+def inline_choice(size):
+    blank = ' <input type="blankfield" name="001" /> '
+    words = [Word('word %d' % wid, str(wid)) for wid in range(10)]
+    return InlineChoiceInteraction('inline', 'Fill' + blank * size + 'done', 'title',
+                                   ['%03d' % index for index in range(size)],
+                                   [str(index % 10) for index in range(size)], words, True)
+
+
+def conversion_time(interaction, **options):
+    """Returns the best time of a few conversions of an interaction to QTI and NTI."""
+    times = []
+    for _ in range(3):
+        start = time()
+        interaction.to_qti_bytes(**options)
+        interaction.to_nti_bytes()
+        times.append(time() - start)
+    return min(times)
+
+
+class TestScale(TestCase):
+
+    def assert_linear(self, build, **options):
+        small = conversion_time(build(SMALL), **options)
+        large = conversion_time(build(LARGE), **options)
+        self.assertLess(large, GROWTH * small,
+                        '%d items took %.3fs, %d items %.3fs' % (SMALL, small, LARGE, large))
+
+    def test_choices(self):
+        self.assert_linear(choice)
+
+    def test_labels(self):
+        self.assert_linear(match)
+
+    def test_blanks(self):
+        # the mapping of every blank lists the solution of every blank unless they are unique
+        self.assert_linear(inline_choice, unique_entries=True)
+
+
+if __name__ == '__main__':
+    main()
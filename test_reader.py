@@ -0,0 +1,183 @@
+from json import loads
+
+from mmap import ACCESS_READ
+from mmap import mmap
+
+from os.path import join
+
+from shutil import rmtree
+
+from StringIO import StringIO
+
+from tempfile import mkdtemp
+
+from unittest import TestCase
+from unittest import main
+
+from reader import EventReader
+from reader import QuestionSpans
+
+
+# small enough that every token of the documents below is split across chunks
+CHUNK_SIZES = range(1, 8)
+
+DOCUMENTS = ['{}', '[]', '"text"', '-12.5e3', 'null',
+             '{"a": 1, "b": [true, false, null], "c": {"d": -0.5, "e": 1E+2, "f": []}}',
+             ' [ 0 , 10 , -3 , 2.25 , {} , [ [ ] ] , "" ] ',
+             '{"quote": "say \\"hi\\"", "slash": "a\\\\b\\\\", "both": "\\\\\\"", '
+             '"escapes": "\\n\\t\\/\\u00e9\\u201c"}',
+             '{"raw": "Caf\xc3\xa9 \xe2\x80\x9cquote\xe2\x80\x9d", '
+             '"caf\xc3\xa9": ["na\xc3\xafve"]}']
+
+MALFORMED = ['{"a":1,}', '[01]', '[1,]', '{"a" 1}', '{"a":1 "b":2}', '[1 2]', '{1: 2}', 'tru',
+             '[1}', '{"a": [1, 2', '"text', '{"a": "b', '[', '', '1 2', '-', '1.', '.5']
+
+# the first question has its parts before its Class, and a Poll holding a question is last
+QUESTIONS = '{"Items": {"q1": {"parts": [{"Class": "FreeResponsePart", "content": "{["}], ' \
+            '"Class": "Question", "content": "\\"}"}, ' \
+            '"set": {"Class": "QuestionSet", "questions": [{"Class": "Question", "parts": []}]}, ' \
+            '"poll": {"Class": "Poll", "parts": [{"Class": "Question"}]}}}'
+
+
+def events(document, chunk_size):
+    return list(EventReader(StringIO(document), chunk_size))
+
+
+def build(events):
+    """Returns the value the events of a document describe."""
+    stack = [[]]
+    keys = []
+    for event, value in events:
+        if event == 'map_key':
+            keys.append(value)
+            continue
+        if event == 'start_map' or event == 'start_array':
+            stack.append({} if event == 'start_map' else [])
+            continue
+        if event == 'end_map' or event == 'end_array':
+            value = stack.pop()
+        if isinstance(stack[-1], dict):
+            stack[-1][keys.pop()] = value
+        else:
+            stack[-1].append(value)
+    return stack[0][0]
+
+
+def spans(document, stream):
+    return [loads(document[start:end]) for start, end in QuestionSpans(stream, 3)]
+
+
+class TestEventReader(TestCase):
+
+    def test_events_match_json(self):
+        for document in DOCUMENTS:
+            for chunk_size in CHUNK_SIZES:
+                self.assertEqual(build(events(document, chunk_size)), loads(document),
+                                 '%r at chunk_size %d' % (document, chunk_size))
+
+    def test_escapes_and_text_outside_ascii(self):
+        found = dict(build(events(DOCUMENTS[7], 1)), **build(events(DOCUMENTS[8], 1)))
+        self.assertEqual(found['quote'], 'say "hi"')
+        self.assertEqual(found['slash'], 'a\\b\\')
+        self.assertEqual(found['both'], '\\"')
+        self.assertEqual(found['escapes'], u'\n\t/\u00e9\u201c')
+        self.assertEqual(found['raw'], u'Caf\u00e9 \u201cquote\u201d')
+        self.assertEqual(found[u'caf\u00e9'], [u'na\u00efve'])
+
+    def test_malformed_documents_raise(self):
+        for document in MALFORMED:
+            for chunk_size in CHUNK_SIZES:
+                try:
+                    events(document, chunk_size)
+                except ValueError:
+                    continue
+                self.fail('%r at chunk_size %d did not raise' % (document, chunk_size))
+
+    def test_skip(self):
+        document = '{"a": {"b": "x}]\\"{[\\\\", "c": [1, {"d": "]"}]}, "e": 3}'
+        for chunk_size in CHUNK_SIZES:
+            reader = EventReader(StringIO(document), chunk_size)
+            self.assertEqual([next(reader) for _ in range(3)],
+                             [('start_map', None), ('map_key', 'a'), ('start_map', None)])
+            reader.skip()
+            self.assertEqual(list(reader), [('map_key', 'e'), ('number', 3), ('end_map', None)])
+
+    def test_skip_last_container(self):
+        document = '{"Items": {"poll": {"Class": "Poll", "parts": [{"Class": "Question"}]}}}'
+        for chunk_size in CHUNK_SIZES:
+            reader = EventReader(StringIO(document), chunk_size)
+            while next(reader) != ('string', 'Poll'):
+                pass
+            reader.skip()
+            self.assertEqual(list(reader), [('end_map', None), ('end_map', None)])
+            self.assertEqual(reader.depth, 0)
+
+    def test_skip_without_container_raises(self):
+        reader = EventReader(StringIO('1'))
+        self.assertRaises(ValueError, reader.skip)
+
+    def test_truncated_skip_raises(self):
+        for chunk_size in CHUNK_SIZES:
+            reader = EventReader(StringIO('{"a": [1, "]'), chunk_size)
+            next(reader)
+            next(reader)
+            next(reader)
+            self.assertRaises(ValueError, reader.skip)
+
+
+class TestQuestionSpans(TestCase):
+
+    def test_questions(self):
+        self.assertEqual([question['Class'] for question in spans(QUESTIONS,
+                                                                  StringIO(QUESTIONS))],
+                         ['Question', 'Question'])
+        self.assertEqual(spans(QUESTIONS, StringIO(QUESTIONS))[0]['content'], '"}')
+
+    def test_poll_is_ignored(self):
+        for chunk_size in CHUNK_SIZES:
+            found = [loads(QUESTIONS[start:end])
+                     for start, end in QuestionSpans(StringIO(QUESTIONS), chunk_size)]
+            self.assertEqual(len(found), 2)
+            self.assertNotIn('Poll', [question['Class'] for question in found])
+
+    def test_unterminated_string_raises(self):
+        self.assertRaises(ValueError, list, QuestionSpans(StringIO('{"Class": "Quest'), 4))
+
+
+class TestMemoryMap(TestCase):
+
+    def setUp(self):
+        self.path = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.path)
+
+    def mapped(self, document):
+        file_name = join(self.path, 'document.json')
+        json_file = open(file_name, 'wb')
+        json_file.write(document)
+        json_file.close()
+        json_file = open(file_name, 'rb')
+        self.addCleanup(json_file.close)
+        mapped = mmap(json_file.fileno(), 0, access=ACCESS_READ)
+        self.addCleanup(mapped.close)
+        return mapped
+
+    def test_events(self):
+        for document in DOCUMENTS[5:]:
+            self.assertEqual(list(EventReader(self.mapped(document))), events(document, 7))
+
+    def test_skip(self):
+        reader = EventReader(self.mapped(QUESTIONS))
+        while next(reader) != ('string', 'Poll'):
+            pass
+        reader.skip()
+        self.assertEqual(list(reader), [('end_map', None), ('end_map', None)])
+
+    def test_spans(self):
+        self.assertEqual(spans(QUESTIONS, self.mapped(QUESTIONS)),
+                         spans(QUESTIONS, StringIO(QUESTIONS)))
+
+
+if __name__ == '__main__':
+    main()
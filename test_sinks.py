@@ -0,0 +1,141 @@
+from datetime import datetime
+
+from os.path import join
+
+from shutil import rmtree
+
+from tempfile import mkdtemp
+
+from unittest import TestCase
+from unittest import main
+
+from zipfile import ZIP_DEFLATED
+from zipfile import ZIP_STORED
+from zipfile import ZipFile
+
+from sinks import CHUNK_SIZE
+from sinks import ZipSink
+from sinks import deflate
+from sinks import write_file
+from sinks import write_member
+
+
+# text that deflates well, and bytes that do not, both longer than a chunk
+TEXT = ''.join('<value>%d</value>\n' % index for index in range(CHUNK_SIZE // 4))
+NOISE = ''.join(chr(index * 7919 % 251) for index in range(3 * CHUNK_SIZE + 17))
+
+TIMESTAMP = datetime(2001, 2, 3, 4, 5, 6)
+
+
+class TestZipMembers(TestCase):
+
+    def setUp(self):
+        self.path = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.path)
+
+    def zip_name(self):
+        return join(self.path, 'test.zip')
+
+    def data_file(self, data):
+        file_name = join(self.path, 'data')
+        data_file = open(file_name, 'wb')
+        data_file.write(data)
+        data_file.close()
+        return file_name
+
+    def check(self, members):
+        """Checks that the zip holds the (name, data, compression) members and nothing else."""
+        zip_file = ZipFile(self.zip_name())
+        self.assertIsNone(zip_file.testzip())
+        self.assertEqual(zip_file.namelist(), [name for name, _, _ in members])
+        for name, data, compression in members:
+            self.assertEqual(zip_file.read(name), data)
+            self.assertEqual(zip_file.getinfo(name).compress_type, compression)
+        zip_file.close()
+        return zip_file
+
+    def test_write_member(self):
+        zip_file = ZipFile(self.zip_name(), 'w', ZIP_STORED)
+        write_member(zip_file, 'plain', TEXT)
+        write_member(zip_file, 'dated', TEXT, TIMESTAMP)
+        write_member(zip_file, 'deflated', TEXT, None, deflate(TEXT, 9))
+        write_member(zip_file, 'both', NOISE, TIMESTAMP, deflate(NOISE, 1))
+        write_member(zip_file, 'empty', '', TIMESTAMP, deflate(''))
+        zip_file.close()
+
+        zip_file = self.check([('plain', TEXT, ZIP_STORED), ('dated', TEXT, ZIP_STORED),
+                               ('deflated', TEXT, ZIP_DEFLATED), ('both', NOISE, ZIP_DEFLATED),
+                               ('empty', '', ZIP_DEFLATED)])
+        self.assertEqual(zip_file.getinfo('dated').date_time, (2001, 2, 3, 4, 5, 6))
+        self.assertEqual(zip_file.getinfo('both').date_time, (2001, 2, 3, 4, 5, 6))
+        self.assertLess(zip_file.getinfo('deflated').compress_size, len(TEXT))
+
+    def test_deflated_member_matches_zipfile(self):
+        zip_file = ZipFile(self.zip_name(), 'w', ZIP_DEFLATED)
+        write_member(zip_file, 'zipfile', TEXT, TIMESTAMP)
+        write_member(zip_file, 'deflated', TEXT, TIMESTAMP, deflate(TEXT))
+        zip_file.close()
+
+        zip_file = self.check([('zipfile', TEXT, ZIP_DEFLATED), ('deflated', TEXT, ZIP_DEFLATED)])
+        self.assertEqual(zip_file.getinfo('zipfile').compress_size,
+                         zip_file.getinfo('deflated').compress_size)
+
+    def test_write_file(self):
+        text_file = self.data_file(TEXT)
+        zip_file = ZipFile(self.zip_name(), 'w', ZIP_STORED)
+        write_file(zip_file, 'stored', text_file)
+        write_file(zip_file, 'dated', text_file, TIMESTAMP)
+        write_file(zip_file, 'deflated', text_file, TIMESTAMP, 6)
+        write_file(zip_file, 'noise', self.data_file(NOISE), None, 1)
+        write_file(zip_file, 'empty', self.data_file(''), None, 9)
+        zip_file.close()
+
+        zip_file = self.check([('stored', TEXT, ZIP_STORED), ('dated', TEXT, ZIP_STORED),
+                               ('deflated', TEXT, ZIP_DEFLATED), ('noise', NOISE, ZIP_DEFLATED),
+                               ('empty', '', ZIP_DEFLATED)])
+        self.assertEqual(zip_file.getinfo('deflated').date_time, (2001, 2, 3, 4, 5, 6))
+
+    def test_zip_sink(self):
+        for workers in (1, 3):
+            sink = ZipSink(self.zip_name(), ZIP_DEFLATED, TIMESTAMP, 6, workers=workers)
+            sink.writestr('item.xml', TEXT)
+            sink.writestr('package.zip', NOISE)
+            sink.write(self.data_file(NOISE), 'noise')
+            sink.writestr('last.xml', TEXT)
+            sink.close()
+
+            self.check([('item.xml', TEXT, ZIP_DEFLATED), ('package.zip', NOISE, ZIP_STORED),
+                        ('noise', NOISE, ZIP_DEFLATED), ('last.xml', TEXT, ZIP_DEFLATED)])
+
+    def test_zip_sink_is_deterministic(self):
+        contents = []
+        for workers in (1, 2):
+            sink = ZipSink(self.zip_name(), ZIP_DEFLATED, TIMESTAMP, 9, workers=workers)
+            for index in range(10):
+                sink.writestr('item%d.xml' % index, TEXT * index)
+            sink.close()
+            zip_file = open(self.zip_name(), 'rb')
+            contents.append(zip_file.read())
+            zip_file.close()
+        self.assertEqual(contents[0], contents[1])
+
+    def test_zip_sink_holds_more_than_65535_members(self):
+        count = 70000
+        sink = ZipSink(self.zip_name(), ZIP_DEFLATED, TIMESTAMP, 1)
+        for index in range(count - 1):
+            sink.writestr('item%d.xml' % index, str(index))
+        sink.write(self.data_file(TEXT), 'imsmanifest.xml')
+        sink.close()
+
+        zip_file = ZipFile(self.zip_name())
+        self.assertEqual(len(zip_file.namelist()), count)
+        self.assertIsNone(zip_file.testzip())
+        self.assertEqual(zip_file.read('item65535.xml'), '65535')
+        self.assertEqual(zip_file.read('imsmanifest.xml'), TEXT)
+        zip_file.close()
+
+
+if __name__ == '__main__':
+    main()
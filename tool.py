@@ -1,27 +1,102 @@
 #!/usr/bin/env python
 from argparse import ArgumentParser
 
+from datetime import datetime
+
+from os import environ
+
 from os.path import basename
 from os.path import dirname
 from os.path import realpath
 from os.path import splitext
 
 from nti_collector import NTICollector
+from nti_collector import export_name
 
 from qti_collector import QTICollector
 
+from cache import PackageCache
+
+from encoder import ENCODER
+from encoder import ENCODERS
+from encoder import use_encoder
+
 from extractor import Extractor
 
+from manifest import EPOCH
+
+from sinks import DirectorySink
+from sinks import NullSink
+from sinks import TarSink
+
 PARSER = ArgumentParser(description='Export/Import NTI/QTI packages.')
 PARSER.add_argument('file', type=file, help='This is the file to be parsed.')
+PARSER.add_argument('--lazy', action='store_true',
+                    help='Convert each NTI question as soon as it is read.')
+PARSER.add_argument('--jobs', type=int, default=1,
+                    help='The number of processes converting NTI questions to QTI items.')
+PARSER.add_argument('--mmap', action='store_true',
+                    help='Memory-map the NTI export instead of reading it in chunks.')
+PARSER.add_argument('--class-type', action='append', default=[],
+                    help='Only convert parts of this NTI part class or QTI interaction class. '
+                         'Can be given more than once.')
+PARSER.add_argument('--in-memory', action='store_true',
+                    help='Build every QTI package in memory and write it straight into the export.')
+PARSER.add_argument('--compact', action='store_true',
+                    help='Write the QTI XML and NTI JSON without any indentation.')
+PARSER.add_argument('--sink', choices=('zip', 'tar', 'directory', 'null'), default='zip',
+                    help='Where to write the QTI packages: an export zip (the default), an export '
+                         'tar, an export directory, or nowhere at all.')
+PARSER.add_argument('--single-package', action='store_true',
+                    help='Write every QTI item into the export with one manifest listing them all, '
+                         'instead of a package per item.')
+PARSER.add_argument('--deterministic', action='store_true',
+                    help='Derive the ids in the QTI manifests from the items and date every '
+                         'manifest and zip entry SOURCE_DATE_EPOCH (or 1980-01-01), so that the '
+                         'same NTI file always gives the same export.')
+PARSER.add_argument('--cache',
+                    help='A directory keeping every converted QTI item, so that a later export '
+                         'only converts the questions that changed.')
+PARSER.add_argument('--level', type=int, choices=range(10),
+                    help='Deflate the packages and the export at this zlib level, from 0 (fastest) '
+                         'to 9 (smallest), instead of storing them. Packages inside the export are '
+                         'stored as they are.')
+PARSER.add_argument('--zip-workers', type=int, default=1,
+                    help='The number of threads deflating the members of the export.')
+PARSER.add_argument('--json-encoder', choices=sorted(ENCODERS), default=ENCODER,
+                    help='The encoder writing the NTI JSON. Every encoder writes the same bytes; '
+                         'the default is the fastest one installed.')
 ARGS = PARSER.parse_args()
 
+use_encoder(ARGS.json_encoder)
+
+if not ARGS.deterministic:
+    TIMESTAMP = None
+elif 'SOURCE_DATE_EPOCH' in environ:
+    TIMESTAMP = datetime.utcfromtimestamp(int(environ['SOURCE_DATE_EPOCH']))
+else:
+    TIMESTAMP = EPOCH
+
+SINKS = {'zip': lambda name: None,
+         'tar': lambda name: TarSink(name + '.tar', timestamp=TIMESTAMP),
+         'directory': DirectorySink,
+         'null': lambda name: NullSink()}
+
 if ARGS.file.name.endswith('.json'):
-    NTICollector(basename(ARGS.file.name), realpath(ARGS.file.name)[:-5] + '/')
+    SINK = SINKS[ARGS.sink](export_name(realpath(ARGS.file.name)[:-5] + '/', ''))
+    NTICollector(basename(ARGS.file.name), realpath(ARGS.file.name)[:-5] + '/',
+                 class_type=set(ARGS.class_type), lazy=ARGS.lazy, workers=ARGS.jobs,
+                 memory_map=ARGS.mmap, in_memory=ARGS.in_memory, compact=ARGS.compact, sink=SINK,
+                 single_package=ARGS.single_package, timestamp=TIMESTAMP,
+                 cache=PackageCache(ARGS.cache) if ARGS.cache else None, level=ARGS.level,
+                 zip_workers=ARGS.zip_workers)
+    if SINK is not None:
+        SINK.close()
 elif ARGS.file.name.endswith('.zip'):
-    Extractor(realpath(ARGS.file.name))
+    Extractor(realpath(ARGS.file.name), level=ARGS.level, zip_workers=ARGS.zip_workers,
+              compact=ARGS.compact)
 elif ARGS.file.name.endswith('.xml'):
-    QTICollector(realpath(ARGS.file.name), dirname(realpath(ARGS.file.name)))
+    QTICollector(realpath(ARGS.file.name), dirname(realpath(ARGS.file.name)), ARGS.compact)
 else:
     print 'file cannot end in ' + splitext(realpath(ARGS.file.name))[1]
     print 'file must end in either .json, .zip, or .xml'
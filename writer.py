@@ -0,0 +1,129 @@
+from cStringIO import StringIO
+
+from xml.etree.ElementTree import Element
+
+
+# marks the fields of a template in its serialized form
+MARKER = '\x00'
+
+
+def write_xml(element, stream, indent='  ', compact=False):
+    """Writes an ElementTree element to a stream as indented XML in a single pass.
+
+    The layout is the one of minidom's toprettyxml: attributes are sorted by name, an element
+    holding nothing but text is kept on one line and every other node gets a line of its own.
+    When compact, no whitespace at all is added between the nodes.
+    Unicode text is written as UTF-8, so the stream should be opened in binary mode.
+
+    :param element: The root element of the document.
+    :param stream: A file-like object opened in binary mode, or a buffer.
+    :param str indent: The string added in front of every line per level of nesting.
+    :param bool compact: Whether to leave out the indentation and line breaks.
+    """
+    newline = '' if compact else '\n'
+    write = stream.write
+    write('<?xml version="1.0" ?>' + newline)
+    write_element(element, write, '', '' if compact else indent, newline)
+
+
+def to_xml(element, indent='  ', compact=False):
+    """Returns an ElementTree element as indented (or compact) XML, encoded as UTF-8."""
+    buf = StringIO()
+    write_xml(element, buf, indent, compact)
+    return buf.getvalue()
+
+
+class Fragment(Element):
+    """An element that never changes, and can be shared by any number of documents.
+
+    It is serialized once for every layout it is written in and then copied as is. A fragment
+    cannot have a tail, and its children must not be changed once it has been written.
+    """
+
+    def __init__(self, tag, attrib={}, **extra):
+        Element.__init__(self, tag, attrib, **extra)
+        self.serialized = {}
+
+    def serialize(self, margin, indent, newline):
+        key = margin, indent, newline
+        if key not in self.serialized:
+            buf = StringIO()
+            write_node(self, buf.write, margin, indent, newline)
+            self.serialized[key] = buf.getvalue()
+        return self.serialized[key]
+
+
+class Template(object):
+    """A document that is serialized once, with only its fields filled in for every copy.
+
+    The text and attribute values of the element may hold fields made with field(name). They are
+    replaced by the escaped values given to render().
+
+    A template of an element nested at some depth of a document is laid out for that depth, and
+    has no XML declaration.
+
+    :param element: The root element of the document, or the element at depth.
+    :param str indent: The string added in front of every line per level of nesting.
+    :param bool compact: Whether to leave out the indentation and line breaks.
+    :param int depth: The number of elements the element is nested in.
+    """
+
+    def __init__(self, element, indent='  ', compact=False, depth=0):
+        if depth:
+            buf = StringIO()
+            write_element(element, buf.write, '' if compact else indent * depth,
+                          '' if compact else indent, '' if compact else '\n')
+            xml = buf.getvalue()
+        else:
+            xml = to_xml(element, indent, compact)
+        # constant parts and field names alternate
+        self.parts = xml.split(MARKER)
+
+    def render(self, **values):
+        parts = list(self.parts)
+        for index in range(1, len(parts), 2):
+            parts[index] = escape(values[parts[index]])
+        return ''.join(parts)
+
+
+def field(name):
+    """Returns the placeholder of a template field."""
+    return MARKER + name + MARKER
+
+
+def write_element(element, write, margin, indent, newline):
+    if isinstance(element, Fragment):
+        write(element.serialize(margin, indent, newline))
+    else:
+        write_node(element, write, margin, indent, newline)
+
+
+def write_node(element, write, margin, indent, newline):
+    write(margin + '<' + element.tag)
+    attributes = element.attrib
+    for name in sorted(attributes):
+        write(' ' + name + '="' + escape(attributes[name]) + '"')
+
+    if not len(element):
+        if element.text:
+            write('>' + escape(element.text) + '</' + element.tag + '>' + newline)
+        else:
+            write('/>' + newline)
+        return
+
+    write('>' + newline)
+    inner = margin + indent
+    if element.text:
+        write(inner + escape(element.text) + newline)
+    for child in element:
+        write_element(child, write, inner, indent, newline)
+        if child.tail:
+            write(inner + escape(child.tail) + newline)
+    write(margin + '</' + element.tag + '>' + newline)
+
+
+def escape(data):
+    if isinstance(data, unicode):
+        data = data.encode('utf-8')
+    return data.replace('&', '&amp;').replace('<', '&lt;').replace('"', '&quot;') \
+        .replace('>', '&gt;')